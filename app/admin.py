@@ -1,10 +1,11 @@
 from django.contrib import admin
 
-from .models import Question, Answer, Tag, Profile, QuestionLike, AnswerLike
+from .models import Question, Answer, Tag, Profile, QuestionLike, AnswerLike, Job
 
 admin.site.register(Question)
 admin.site.register(Answer)
 admin.site.register(Tag)
 admin.site.register(Profile)
 admin.site.register(QuestionLike)
-admin.site.register(AnswerLike)
\ No newline at end of file
+admin.site.register(AnswerLike)
+admin.site.register(Job)
\ No newline at end of file
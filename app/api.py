@@ -0,0 +1,171 @@
+import hashlib
+import json
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+
+from . import cursors
+from .models import Question, Answer, Tag
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_AGE = 60
+
+QUESTION_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'content': 'content',
+    'created_at': 'created_at',
+    'rating': 'rating',
+    'answers_count': 'answers_count',
+    'accepted_answer_id': 'accepted_answer_id',
+    'author_id': 'author_id',
+    'author': 'author__username',
+}
+
+ANSWER_FIELDS = {
+    'id': 'id',
+    'question_id': 'question_id',
+    'content': 'content',
+    'created_at': 'created_at',
+    'is_correct': 'is_correct',
+    'rating': 'rating',
+    'author_id': 'author_id',
+    'author': 'author__username',
+}
+
+QUESTION_ORDERINGS = {
+    'new': ['-created_at', '-id'],
+    'hot': ['-rating', '-created_at', '-id'],
+}
+
+ANSWER_ORDERING = ['created_at', 'id']
+
+
+class ApiError(Exception):
+    pass
+
+
+def error_response(message, status=400):
+    return JsonResponse({'status': 'error', 'message': message}, status=status)
+
+
+def parse_fields(request, allowed, extra=()):
+    """Return the requested field names (all of them when none given)."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(allowed) + list(extra)
+    fields = [field for field in requested.split(',') if field]
+    unknown = [field for field in fields if field not in allowed and field not in extra]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('Invalid limit')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def paginate_values(request, queryset, ordering, columns, limit):
+    """Fetch one keyset page as dicts; returns (rows, next_cursor)."""
+    queryset = queryset.prefetch_related(None)
+    try:
+        return cursors.page(queryset, ordering, request.GET.get('cursor'), limit, fields=columns.values())
+    except cursors.InvalidCursor:
+        raise ApiError('Invalid cursor')
+
+
+def add_tags(rows):
+    question_ids = [row['id'] for row in rows]
+    tags = defaultdict(list)
+    through = Question.tags.through.objects.filter(question_id__in=question_ids).order_by('id')
+    for question_id, tag_name in through.values_list('question_id', 'tag__name'):
+        tags[question_id].append(tag_name)
+    for row in rows:
+        row['tags'] = tags[row['id']]
+
+
+def render(request, rows, columns, next_cursor):
+    results = [{field: row[column] for field, column in columns.items()} for row in rows]
+    body = json.dumps({'results': results, 'next': next_cursor}, cls=DjangoJSONEncoder)
+    etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+@require_GET
+def questions(request):
+    try:
+        fields = parse_fields(request, QUESTION_FIELDS, extra=['tags'])
+        limit = parse_limit(request)
+        sort = request.GET.get('sort', 'new')
+        if sort not in QUESTION_ORDERINGS:
+            raise ApiError('Invalid sort')
+        tag = request.GET.get('tag')
+        if tag:
+            queryset = Question.objects.by_tag(tag)
+        elif sort == 'hot':
+            queryset = Question.objects.hot()
+        else:
+            queryset = Question.objects.new()
+        columns = {field: QUESTION_FIELDS[field] for field in fields if field in QUESTION_FIELDS}
+        rows, next_cursor = paginate_values(request, queryset, QUESTION_ORDERINGS[sort], columns, limit)
+    except ApiError as e:
+        return error_response(str(e))
+
+    if 'tags' in fields:
+        add_tags(rows)
+        columns['tags'] = 'tags'
+    return render(request, rows, columns, next_cursor)
+
+
+@require_GET
+def answers(request, question_id):
+    try:
+        fields = parse_fields(request, ANSWER_FIELDS)
+        limit = parse_limit(request)
+        columns = {field: ANSWER_FIELDS[field] for field in fields}
+        queryset = Answer.objects.by_question(question_id)
+        rows, next_cursor = paginate_values(request, queryset, ANSWER_ORDERING, columns, limit)
+    except ApiError as e:
+        return error_response(str(e))
+
+    if not rows and not Question.objects.filter(id=question_id).exists():
+        return error_response('Question not found', status=404)
+    return render(request, rows, columns, next_cursor)
+
+
+@require_GET
+def suggest_tags(request):
+    """Most used tags starting with ``prefix``, for autocompletion."""
+    prefix = request.GET.get('prefix', '').strip()
+    if not prefix:
+        return error_response('Missing prefix')
+    tags = Tag.objects.suggest(prefix, SUGGEST_LIMIT).values('name', 'questions_count')
+    response = JsonResponse({'results': list(tags)})
+    patch_cache_control(response, public=True, max_age=SUGGEST_MAX_AGE)
+    return response
+
+
+@require_GET
+def similar_questions(request):
+    """Questions like the one being asked (``title``, optionally ``text``), for the ask form."""
+    from app import duplicates
+
+    title = request.GET.get('title', '').strip()
+    if not title:
+        return error_response('Missing title')
+    response = JsonResponse({'results': duplicates.find(title, request.GET.get('text', ''))})
+    patch_cache_control(response, public=True, max_age=SUGGEST_MAX_AGE)
+    return response
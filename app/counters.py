@@ -0,0 +1,140 @@
+"""Set-based recount of the denormalized counters.
+
+Question, answer and tag counters are kept by the statement-level triggers
+installed in migration 0007, per-user counters by UserStatsManager.add_many().
+Both are bypassed by raw SQL, TRUNCATE or restored dumps, so every counter is
+also defined here as an aggregate over its source table.
+"""
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from app.models import Question, Answer, Tag, QuestionLike, AnswerLike, UserStats
+from app.models import VOTE_VALUES, VOTE_REPUTATION, ANSWER_REPUTATION, ACCEPTED_REPUTATION
+
+
+def vote_case(values, column='type'):
+    whens = ' '.join(f"WHEN '{vote}' THEN {value:d}" for vote, value in values.items())
+    return f'CASE {column} {whens} ELSE 0 END'
+
+
+class Counter:
+    """``table.field`` must equal ``value`` of the ``source`` row with the same key (or 0)."""
+
+    def __init__(self, model, field, source, key='id'):
+        self.table = model._meta.db_table
+        self.name = f'{model._meta.model_name}.{field}'
+        self.field = field
+        self.source = source
+        self.key = key
+
+    def mismatched(self):
+        return (
+            f'SELECT t.{self.key} AS key, COALESCE(c.value, 0) AS value FROM {self.table} t '
+            f'LEFT JOIN ({self.source}) c ON c.key = t.{self.key} '
+            f'WHERE t.{self.field} IS DISTINCT FROM COALESCE(c.value, 0)'
+        )
+
+    def drift(self, cursor):
+        cursor.execute(f'SELECT COUNT(*) FROM ({self.mismatched()}) m')
+        return cursor.fetchone()[0]
+
+    def repair(self, cursor):
+        cursor.execute(
+            f'UPDATE {self.table} t SET {self.field} = m.value '
+            f'FROM ({self.mismatched()}) m WHERE t.{self.key} = m.key'
+        )
+        return cursor.rowcount
+
+
+QUESTION = Question._meta.db_table
+ANSWER = Answer._meta.db_table
+QUESTION_LIKE = QuestionLike._meta.db_table
+ANSWER_LIKE = AnswerLike._meta.db_table
+QUESTION_TAGS = Question.tags.through._meta.db_table
+
+# Order matters: user ratings are summed from the stored post ratings.
+COUNTERS = [
+    Counter(Question, 'answers_count', f'SELECT question_id AS key, COUNT(*) AS value FROM {ANSWER} GROUP BY 1'),
+    Counter(Question, 'rating', f'SELECT question_id AS key, SUM({vote_case(VOTE_VALUES)}) AS value '
+                                f'FROM {QUESTION_LIKE} GROUP BY 1'),
+    Counter(Answer, 'rating', f'SELECT answer_id AS key, SUM({vote_case(VOTE_VALUES)}) AS value '
+                              f'FROM {ANSWER_LIKE} GROUP BY 1'),
+    Counter(Tag, 'questions_count', f'SELECT tag_id AS key, COUNT(*) AS value FROM {QUESTION_TAGS} GROUP BY 1'),
+    Counter(UserStats, 'questions_count', f'SELECT author_id AS key, COUNT(*) AS value FROM {QUESTION} GROUP BY 1',
+            key='user_id'),
+    Counter(UserStats, 'answers_count', f'SELECT author_id AS key, COUNT(*) AS value FROM {ANSWER} GROUP BY 1',
+            key='user_id'),
+    Counter(UserStats, 'accepted_answers_count',
+            f'SELECT author_id AS key, COUNT(*) AS value FROM {ANSWER} WHERE is_correct GROUP BY 1',
+            key='user_id'),
+    Counter(UserStats, 'rating', f"""
+        SELECT author_id AS key, SUM(rating) AS value FROM (
+            SELECT author_id, rating FROM {QUESTION}
+            UNION ALL
+            SELECT author_id, rating FROM {ANSWER}
+        ) posts GROUP BY 1
+    """, key='user_id'),
+    Counter(UserStats, 'reputation', f"""
+        SELECT author_id AS key, SUM(points) AS value FROM (
+            SELECT author_id, {ANSWER_REPUTATION:d} + {ACCEPTED_REPUTATION:d} * is_correct::int AS points
+            FROM {ANSWER}
+            UNION ALL
+            SELECT t.author_id, {vote_case(VOTE_REPUTATION['question'], 'v.type')}
+            FROM {QUESTION_LIKE} v JOIN {QUESTION} t ON t.id = v.question_id
+            UNION ALL
+            SELECT t.author_id, {vote_case(VOTE_REPUTATION['answer'], 'v.type')}
+            FROM {ANSWER_LIKE} v JOIN {ANSWER} t ON t.id = v.answer_id
+        ) points GROUP BY 1
+    """, key='user_id'),
+]
+
+# Weekly reputation buckets are history, not a function of current rows,
+# so they are not recounted.
+SOURCE_TABLES = [QUESTION, ANSWER, QUESTION_LIKE, ANSWER_LIKE, QUESTION_TAGS]
+
+
+def select(names=None):
+    """Counters matching ``names`` ('question.rating' or a whole 'question'), in recount order."""
+    if not names:
+        return list(COUNTERS)
+    selected = set()
+    for name in names:
+        matches = [counter for counter in COUNTERS if counter.name == name or counter.name.startswith(f'{name}.')]
+        if not matches:
+            raise ValueError(f'Unknown counter {name!r}')
+        selected.update(matches)
+    return [counter for counter in COUNTERS if counter in selected]
+
+
+def missing_user_stats(cursor, create):
+    """Count (and with ``create``, insert zeroed) stats rows of users without one."""
+    table = UserStats._meta.db_table
+    missing = f'FROM {User._meta.db_table} u WHERE NOT EXISTS (SELECT 1 FROM {table} s WHERE s.user_id = u.id)'
+    if not create:
+        cursor.execute(f'SELECT COUNT(*) {missing}')
+        return cursor.fetchone()[0]
+    fields = UserStats.objects.COUNTERS
+    cursor.execute(
+        f"INSERT INTO {table} (user_id, {', '.join(fields)}) "
+        f"SELECT u.id{', 0' * len(fields)} {missing}"
+    )
+    return cursor.rowcount
+
+
+@transaction.atomic
+def recount(names=None, dry_run=False):
+    """Rebuild the selected counters; returns [(name, drifted rows)].
+
+    Writes to the source tables wait until the recount commits, so no
+    concurrent delta is lost between reading the aggregate and storing it.
+    """
+    counters = select(names)
+    results = []
+    with connection.cursor() as cursor:
+        if not dry_run:
+            cursor.execute(f"LOCK TABLE {', '.join(SOURCE_TABLES)} IN SHARE MODE")
+        if any(counter.table == UserStats._meta.db_table for counter in counters):
+            results.append(('userstats.rows', missing_user_stats(cursor, create=not dry_run)))
+        for counter in counters:
+            results.append((counter.name, counter.drift(cursor) if dry_run else counter.repair(cursor)))
+    return results
@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode(values):
+    # Not DjangoJSONEncoder: it truncates datetimes to milliseconds.
+    raw = json.dumps(values, default=datetime.isoformat).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode(cursor, ordering):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor(cursor)
+    try:
+        return [
+            datetime.fromisoformat(value) if field.lstrip('-') == 'created_at' else int(value)
+            for field, value in zip(ordering, values)
+        ]
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def keyset_filter(ordering, values):
+    """Build a filter selecting rows strictly after ``values`` in ``ordering``."""
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+def page(queryset, ordering, cursor, limit, fields=None):
+    """Fetch the page after ``cursor``; returns (rows, next_cursor).
+
+    With ``fields`` the rows are dicts from values(), otherwise model
+    instances. ``ordering`` must end with a unique column.
+    """
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode(cursor, ordering)))
+    sort_columns = [field.lstrip('-') for field in ordering]
+    queryset = queryset.order_by(*ordering)
+    if fields is not None:
+        queryset = queryset.values(*set(fields) | set(sort_columns))
+    rows = list(queryset[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if fields is None:
+            next_cursor = encode([getattr(last, column) for column in sort_columns])
+        else:
+            next_cursor = encode([last[column] for column in sort_columns])
+    return rows, next_cursor
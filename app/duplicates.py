@@ -0,0 +1,180 @@
+"""Likely duplicates of a new question, by MinHash and locality-sensitive hashing.
+
+A question's title is the set of its words, its content the set of its
+word triples; the similarity of two sets is their Jaccard index. A
+MinHash signature of NUM_PERM minimums estimates it: the share of equal
+positions. Signatures are cut into BANDS bands of ROWS values
+and every band is hashed into a bucket (QuestionBucket), so questions
+sharing a bucket are candidates; with 32 bands of 4 a pair of similarity
+0.5 shares one with probability 0.87, a pair of 0.2 with 0.05. A lookup
+reads the buckets of the draft from one index and compares the
+signatures (QuestionSignature) of the candidates only, whatever the
+number of questions.
+
+Titles and contents are compared separately and a question scores the
+higher of the two. Questions are indexed when asked (AskForm) and in
+bulk by ``manage.py index_duplicates``; changing the parameters below
+requires ``index_duplicates --rebuild``. Requires NumPy, imported on
+first use by the callers.
+"""
+import hashlib
+import re
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Subquery
+
+from app.models import Question, QuestionBucket, QuestionSignature
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SEED = 20261019
+# Content with fewer word triples says too little to compare.
+MIN_CONTENT_SHINGLES = 5
+MIN_SIMILARITY = 0.5
+RESULT_LIMIT = 5
+MAX_CANDIDATES = 200
+BATCH_SIZE = 2000
+
+TITLE, CONTENT = 0, 1
+WORD = re.compile(r'\w+')
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+# (a * x + b) mod p with x, a < 2**32, 2**31: no uint64 overflow.
+_random = np.random.default_rng(SEED)
+HASH_A = _random.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+HASH_B = _random.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text, size):
+    words = WORD.findall(text.lower())
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(features):
+    """The signature (NUM_PERM uint32) of a set of strings."""
+    values = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=4).digest(), 'little') for feature in features),
+        dtype=np.uint64,
+        count=len(features),
+    )
+    hashed = (np.outer(values, HASH_A) + HASH_B) % MERSENNE_PRIME & MAX_HASH
+    return hashed.min(axis=0).astype(np.uint32)
+
+
+def signatures(title, content):
+    """(title signature, content signature); either is None when there is too little text."""
+    title_features = shingles(title, 1)
+    content_features = shingles(content, 3)
+    return (
+        minhash(title_features) if title_features else None,
+        minhash(content_features) if len(content_features) >= MIN_CONTENT_SHINGLES else None,
+    )
+
+
+def buckets(signature, kind):
+    """The bucket of every band of ``signature``, as signed 64-bit integers."""
+    if signature is None:
+        return []
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([kind, band]) + signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            'little',
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def index(questions):
+    """Store signatures and buckets for ``questions``: (id, title, content) tuples."""
+    rows, bucket_ids, bucket_values = [], [], []
+    for question_id, title, content in questions:
+        title_signature, content_signature = signatures(title, content)
+        rows.append(QuestionSignature(
+            question_id=question_id,
+            title_signature=title_signature.tobytes() if title_signature is not None else None,
+            content_signature=content_signature.tobytes() if content_signature is not None else None,
+        ))
+        question_buckets = buckets(title_signature, TITLE) + buckets(content_signature, CONTENT)
+        bucket_ids.extend([question_id] * len(question_buckets))
+        bucket_values.extend(question_buckets)
+    QuestionSignature.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    # 64 buckets per question: one statement instead of a model and parameters per row.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {QuestionBucket._meta.db_table} (question_id, bucket) '
+            f'SELECT * FROM unnest(%s::bigint[], %s::bigint[])',
+            [bucket_ids, bucket_values],
+        )
+    return len(rows)
+
+
+def add(question):
+    index([(question.id, question.title, question.content)])
+
+
+def index_missing(batch_size=BATCH_SIZE):
+    """Index the questions without signatures (bulk loaded ones), a batch per transaction; returns the count."""
+    total, last_id = 0, 0
+    while True:
+        batch = list(
+            Question.objects.filter(id__gt=last_id, duplicate_signature__isnull=True)
+            .order_by('id')
+            .values_list('id', 'title', 'content')[:batch_size]
+        )
+        if not batch:
+            return total
+        with transaction.atomic():
+            total += index(batch)
+        last_id = batch[-1][0]
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Index all questions from scratch; lookups find fewer duplicates meanwhile."""
+    with transaction.atomic():
+        QuestionBucket.objects.all().delete()
+        QuestionSignature.objects.all().delete()
+    return index_missing(batch_size)
+
+
+def candidates(keys):
+    """Ids of the questions sharing the most of ``keys`` buckets."""
+    return (
+        QuestionBucket.objects.filter(bucket__in=keys)
+        .values('question_id')
+        .annotate(matches=Count('*'))
+        .order_by('-matches')
+        .values('question_id')[:MAX_CANDIDATES]
+    )
+
+
+def similarity(signature, stored):
+    if signature is None or stored is None:
+        return 0.0
+    return float(np.mean(np.frombuffer(stored, dtype=np.uint32) == signature))
+
+
+def find(title, content='', limit=RESULT_LIMIT, min_similarity=MIN_SIMILARITY):
+    """Questions similar to a draft, most similar first: [{'id', 'title', 'answers_count', 'similarity'}]."""
+    title_signature, content_signature = signatures(title, content)
+    keys = buckets(title_signature, TITLE) + buckets(content_signature, CONTENT)
+    if not keys:
+        return []
+    rows = QuestionSignature.objects.filter(question_id__in=Subquery(candidates(keys))).values_list(
+        'question_id', 'title_signature', 'content_signature', 'question__title', 'question__answers_count'
+    )
+    results = []
+    for question_id, stored_title, stored_content, question_title, answers_count in rows:
+        score = max(similarity(title_signature, stored_title), similarity(content_signature, stored_content))
+        if score >= min_similarity:
+            results.append({
+                'id': question_id,
+                'title': question_title,
+                'answers_count': answers_count,
+                'similarity': round(score, 2),
+            })
+    results.sort(key=lambda result: (-result['similarity'], -result['id']))
+    return results[:limit]
@@ -0,0 +1,143 @@
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+
+CHANNEL = 'askme_events'
+QUEUE_SIZE = 100
+HEARTBEAT = 15
+MAX_AGE = 300
+
+
+def publish(question_id, event, **data):
+    """Send an event to everyone watching the question.
+
+    Uses PostgreSQL NOTIFY, so the event is delivered only if the current
+    transaction commits.
+    """
+    payload = json.dumps({'question': question_id, 'event': event, 'data': data})
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+
+class EventBroker:
+    """Per-process fan-out of NOTIFY messages to per-question subscribers.
+
+    A single LISTEN connection serves every open stream of the worker, so
+    idle streams cost one queue each and no database connection.
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = defaultdict(set)
+        self.connection = None
+        self.loop = None
+
+    @staticmethod
+    def connect():
+        wrapper = connections['default']
+        listener = wrapper.get_new_connection(wrapper.get_connection_params())
+        listener.autocommit = True
+        with listener.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return listener
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.connection is not None and self.loop is loop:
+            return
+        self.stop()
+        listener = await sync_to_async(self.connect, thread_sensitive=False)()
+        if self.connection is not None:
+            # Another stream connected while we were waiting.
+            listener.close()
+            return
+        self.connection = listener
+        self.loop = loop
+        loop.add_reader(self.connection.fileno(), self.dispatch)
+
+    def stop(self):
+        if self.connection is None:
+            return
+        try:
+            self.loop.remove_reader(self.connection.fileno())
+        except (RuntimeError, ValueError):
+            pass
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+        self.loop = None
+        for queues in self.subscribers.values():
+            for queue in queues:
+                self.close(queue)
+
+    def dispatch(self):
+        try:
+            self.connection.poll()
+        except Exception:
+            # Streams end and browsers reconnect, which restarts listening.
+            self.stop()
+            return
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            message = json.loads(notify.payload)
+            for queue in self.subscribers.get(message['question'], ()):
+                self.put(queue, message)
+
+    @staticmethod
+    def put(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow reader: drop the event, the next rating update supersedes it.
+            pass
+
+    @staticmethod
+    def close(queue):
+        while True:
+            try:
+                queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                queue.get_nowait()
+
+    @asynccontextmanager
+    async def subscribe(self, question_id):
+        await self.start()
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers[question_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers[question_id].discard(queue)
+            if not self.subscribers[question_id]:
+                del self.subscribers[question_id]
+
+
+broker = EventBroker()
+
+
+def format_event(message):
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+async def stream(question_id):
+    """Yield server-sent events for the question until MAX_AGE passes."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MAX_AGE
+    async with broker.subscribe(question_id) as queue:
+        yield f'retry: {HEARTBEAT * 1000}\n\n'
+        while loop.time() < deadline:
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if message is None:
+                break
+            yield format_event(message)
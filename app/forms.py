@@ -1,6 +1,10 @@
 from django import forms
 from django.contrib.auth.models import User
-from app.models import Profile, Question, Tag, Answer, QuestionLike, AnswerLike
+from django.db import transaction
+from django.urls import reverse_lazy
+from app import events, objectcache
+from app.models import Profile, Question, Tag, Answer, QuestionLike, AnswerLike, Job, UserStats
+from app.models import VOTE_VALUES, VOTE_REPUTATION, ACCEPTED_REPUTATION
 
 class LoginForm(forms.Form):
     username = forms.CharField(widget=forms.TextInput(attrs={'class': 'form-control w-50'}))
@@ -46,20 +50,20 @@ class SignupForm(forms.Form):
         if data['password'] != data['repeat_password']:
             raise forms.ValidationError('Passwords do not match')
         
+    @transaction.atomic
     def save(self):
         user = User.objects.create_user(
             username=self.cleaned_data['username'],
             email=self.cleaned_data['email'], 
             password=self.cleaned_data['password']
         )   
-        user.save()     
 
         profile = Profile.objects.create(
             user=user,
             nickname=self.cleaned_data['nickname'],
             avatar=self.cleaned_data['avatar']
         )
-        profile.save()
+        Job.objects.enqueue('resize_avatar', key=f'resize_avatar:{profile.id}', profile_id=profile.id)
 
         return user
     
@@ -68,27 +72,56 @@ class AskForm(forms.Form):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
 
-    title = forms.CharField(widget=forms.TextInput(attrs={'class': 'form-control w-100'}), label='Title', max_length=255)
+    title = forms.CharField(widget=forms.TextInput(attrs={
+        'class': 'form-control w-100',
+        'autocomplete': 'off',
+        'data-similar-url': reverse_lazy('api.questions.similar'),
+    }), label='Title', max_length=255)
     text = forms.CharField(widget=forms.Textarea(attrs={'class': 'form-control w-100'}), label='Text', max_length=2048)
-    tags = forms.CharField(widget=forms.TextInput(attrs={'class': 'form-control w-100'}), label='Tags', max_length=255, required=False)
+    tags = forms.CharField(widget=forms.TextInput(attrs={
+        'class': 'form-control w-100',
+        'autocomplete': 'off',
+        'list': 'tag-suggestions',
+        'data-suggest-url': reverse_lazy('api.tags.suggest'),
+    }), label='Tags', max_length=255, required=False)
+    # Shown as a checkbox once similar questions were found.
+    confirm_new = forms.BooleanField(widget=forms.HiddenInput, label='None of the similar questions answers mine', required=False)
+
+    duplicates = ()
 
     def clean_tags(self):
-        _tags = self.cleaned_data['tags'].split(' ') if self.cleaned_data['tags'] else []
+        _tags = self.cleaned_data['tags'].split()
         if len(_tags) > 3:
             raise forms.ValidationError('Too many tags (maximum 3)')
         
         return _tags
+
+    def clean(self):
+        from app import duplicates
+
+        data = super().clean()
+        if 'title' not in data or data.get('confirm_new'):
+            return data
+        self.duplicates = duplicates.find(data['title'], data.get('text', ''))
+        if self.duplicates:
+            self.fields['confirm_new'].widget = forms.CheckboxInput(attrs={'class': 'form-check-input'})
+            raise forms.ValidationError('Similar questions have been asked already: check them or confirm that yours is new')
+        return data
+
+    @transaction.atomic
     def save(self):
+        from app import duplicates
+
         question = Question.objects.create(
             title=self.cleaned_data['title'],
             content=self.cleaned_data['text'],
             author=self.user
         )
-        for tag in self.cleaned_data['tags']:
-            tag, _ = Tag.objects.get_or_create(name=tag)
+        duplicates.add(question)
+        for name in self.cleaned_data['tags']:
+            tag = objectcache.tags.get(name) or Tag.objects.get_or_create(name=name)[0]
             question.tags.add(tag)
-
-        question.save()
+        UserStats.objects.add(self.user.id, questions_count=1)
 
         return question.id
     
@@ -101,15 +134,15 @@ class AnswerForm(forms.Form):
 
     text = forms.CharField(widget=forms.Textarea(attrs={'class': 'form-control w-100', 'rows': 3}), label='Text', max_length=2048)
 
+    @transaction.atomic
     def save(self):
-        question = Question.objects.by_id(self.question).first()
+        question = objectcache.questions.get(self.question)
         answer = Answer.objects.create(
             content=self.cleaned_data['text'],
             author=self.user,
             question=question
         )
-
-        answer.save()
+        objectcache.questions.invalidate(self.question)
 
         return answer.id
 
@@ -143,6 +176,7 @@ class ProfileEditForm(forms.Form):
             raise forms.ValidationError('Email already exists')
         return self.cleaned_data['email'].lower().strip()
 
+    @transaction.atomic
     def save(self):
         user = User.objects.get(id=self.user.id)
         user.username = self.cleaned_data['username']
@@ -153,6 +187,9 @@ class ProfileEditForm(forms.Form):
         profile.nickname = self.cleaned_data['nickname']
         profile.avatar = self.cleaned_data['avatar']
         profile.save()
+        objectcache.profiles.invalidate(profile.id)
+        if self.cleaned_data['avatar']:
+            Job.objects.enqueue('resize_avatar', key=f'resize_avatar:{profile.id}', profile_id=profile.id)
 
 class QuestionLikeForm(forms.Form):
     questionId = forms.IntegerField()
@@ -168,20 +205,19 @@ class QuestionLikeForm(forms.Form):
             raise forms.ValidationError('Invalid like type')
         return like_type
 
+    @transaction.atomic
     def save(self):
-        question = Question.objects.by_id(self.cleaned_data['questionId']).first()
+        question = objectcache.questions.get(self.cleaned_data['questionId'])
         if not question:
             raise forms.ValidationError('Question not found')
             
-        like = QuestionLike.objects.create(
+        QuestionLike.objects.create(
             question=question,
             author=self.user,
             type=self.cleaned_data['type']
         )
-        like.save()
-        question = Question.objects.by_id(self.cleaned_data['questionId']).first()
-        if not question:
-            raise forms.ValidationError('Question not found')
+        objectcache.questions.invalidate(question.id)
+        question.refresh_from_db(fields=['rating'])
         return question.rating
 
 class AnswerLikeForm(forms.Form):
@@ -198,20 +234,21 @@ class AnswerLikeForm(forms.Form):
             raise forms.ValidationError('Invalid like type')
         return like_type
 
+    @transaction.atomic
     def save(self):
         answer = Answer.objects.by_id(self.cleaned_data['answerId']).first()
         if not answer:
             raise forms.ValidationError('Answer not found')
             
-        like = AnswerLike.objects.create(
+        AnswerLike.objects.create(
             answer=answer,
             author=self.user,
             type=self.cleaned_data['type']
         )
-        like.save()
-        answer = Answer.objects.by_id(self.cleaned_data['answerId']).first()
-        if not answer:
-            raise forms.ValidationError('Answer not found')
+        if answer.is_correct:
+            # Cached questions carry their accepted answer.
+            objectcache.questions.invalidate(answer.question_id)
+        answer.refresh_from_db(fields=['rating'])
         return answer.rating
 
 class AnswerApproveForm(forms.Form):
@@ -222,17 +259,116 @@ class AnswerApproveForm(forms.Form):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
 
+    @transaction.atomic
     def save(self):
-        answer = Answer.objects.by_id(self.cleaned_data['answerId']).first()
-        question = Question.objects.by_id(self.cleaned_data['questionId']).first()
-        
-        if not answer or not question:
-            raise forms.ValidationError('Answer or question not found')
-            
-        if self.user != question.author:
+        answer_id = self.cleaned_data['answerId']
+        question_id = self.cleaned_data['questionId']
+        changed = Question.objects.toggle_accepted(question_id, answer_id, self.user.id)
+        if not changed:
+            if not Answer.objects.filter(id=answer_id, question_id=question_id).exists():
+                raise forms.ValidationError('Answer or question not found')
             raise forms.ValidationError('Only question author can approve answers')
-            
-        answer.is_correct = not answer.is_correct
-        answer.save()
-        answer = Answer.objects.by_id(self.cleaned_data['answerId']).first()
-        return answer.is_correct
\ No newline at end of file
+        objectcache.questions.invalidate(question_id)
+
+        deltas = {}
+        for changed_id, author_id, is_correct in changed:
+            sign = 1 if is_correct else -1
+            author = deltas.setdefault(author_id, {'accepted_answers_count': 0, 'reputation': 0})
+            author['accepted_answers_count'] += sign
+            author['reputation'] += sign * ACCEPTED_REPUTATION
+            events.publish(question_id, 'correct', id=changed_id, is_correct=is_correct)
+        UserStats.objects.add_many(deltas)
+        return next(is_correct for changed_id, _, is_correct in changed if changed_id == answer_id)
+
+
+class VoteBatchForm(forms.Form):
+    MAX_VOTES = 100
+    VOTE_VALUES = {**VOTE_VALUES, 'unvote': 0}
+    TARGETS = {
+        'question': (Question, QuestionLike),
+        'answer': (Answer, AnswerLike),
+    }
+
+    votes = forms.JSONField()
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+    def clean_votes(self):
+        votes = self.cleaned_data['votes']
+        if not isinstance(votes, list):
+            raise forms.ValidationError('Expected a list of votes')
+        if len(votes) > self.MAX_VOTES:
+            raise forms.ValidationError(f'Too many votes (maximum {self.MAX_VOTES})')
+
+        # Later votes for the same target replace earlier ones.
+        by_target = {target: {} for target in self.TARGETS}
+        for vote in votes:
+            if not isinstance(vote, dict):
+                raise forms.ValidationError('Invalid vote')
+            if vote.get('target') not in self.TARGETS:
+                raise forms.ValidationError('Invalid vote target')
+            if vote.get('type') not in self.VOTE_VALUES:
+                raise forms.ValidationError('Invalid like type')
+            try:
+                target_id = int(vote.get('id'))
+            except (TypeError, ValueError):
+                raise forms.ValidationError('Invalid vote id')
+            by_target[vote['target']][target_id] = vote['type']
+        return by_target
+
+    def load_authors(self):
+        """Return {target: {id: author_id}}, failing if any target is missing."""
+        authors = {}
+        for target, votes in self.cleaned_data['votes'].items():
+            model, _ = self.TARGETS[target]
+            authors[target] = dict(model.objects.filter(id__in=votes).values_list('id', 'author_id'))
+            if len(authors[target]) != len(votes):
+                raise forms.ValidationError(f'{target.capitalize()} not found')
+        return authors
+
+    def apply_votes(self, target, votes, authors):
+        model, like_model = self.TARGETS[target]
+        target_field = f'{target}_id'
+        previous = dict(like_model.objects.filter(
+            author=self.user, **{f'{target_field}__in': votes}
+        ).values_list(target_field, 'type'))
+
+        like_model.objects.filter(
+            author=self.user,
+            **{f'{target_field}__in': [target_id for target_id, vote in votes.items() if vote == 'unvote']}
+        ).delete()
+        like_model.objects.bulk_create([
+            like_model(author=self.user, type=vote, **{target_field: target_id})
+            for target_id, vote in votes.items() if vote != 'unvote'
+        ], update_conflicts=True, unique_fields=[target, 'author'], update_fields=['type'])
+
+        # Ratings of the targets are adjusted by the vote table triggers.
+        reputation = VOTE_REPUTATION[target]
+        author_deltas = {}
+        for target_id, vote in votes.items():
+            delta = self.VOTE_VALUES[vote] - self.VOTE_VALUES.get(previous.get(target_id), 0)
+            if not delta:
+                continue
+            author = author_deltas.setdefault(authors[target_id], {'rating': 0, 'reputation': 0})
+            author['rating'] += delta
+            author['reputation'] += reputation.get(vote, 0) - reputation.get(previous.get(target_id), 0)
+        UserStats.objects.add_many(author_deltas)
+
+        return dict(model.objects.filter(id__in=votes).values_list('id', 'rating'))
+
+    @transaction.atomic
+    def save(self):
+        authors = self.load_authors()
+        ratings = {}
+        for target, votes in self.cleaned_data['votes'].items():
+            if votes:
+                ratings[target] = self.apply_votes(target, votes, authors[target])
+        voted_questions = set(ratings.get('question', ()))
+        if ratings.get('answer'):
+            voted_questions.update(
+                Answer.objects.correct().filter(id__in=ratings['answer']).values_list('question_id', flat=True)
+            )
+        objectcache.questions.invalidate(*voted_questions)
+        return ratings
@@ -0,0 +1,93 @@
+import traceback
+
+from django.db import transaction
+
+from app import ratelimit
+from app.models import Job, Profile
+
+AVATAR_SIZE = (256, 256)
+
+HANDLERS = {}
+# Jobs that re-enqueue themselves: {name: seconds between runs}.
+PERIODIC = {
+    'rebuild_related': 3600,
+    'prune_rate_limits': 3600,
+}
+
+
+def handler(name):
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+@handler('resize_avatar')
+def resize_avatar(profile_id):
+    from PIL import Image
+
+    profile = Profile.objects.filter(id=profile_id).first()
+    if not profile or not profile.avatar:
+        return
+    with profile.avatar.open('rb') as avatar_file:
+        image = Image.open(avatar_file)
+        image.load()
+    if image.width <= AVATAR_SIZE[0] and image.height <= AVATAR_SIZE[1]:
+        return
+    image.thumbnail(AVATAR_SIZE)
+    with profile.avatar.open('wb') as avatar_file:
+        image.save(avatar_file, format=image.format or 'JPEG')
+
+
+@handler('rebuild_related')
+def rebuild_related():
+    from app import related
+
+    related.rebuild()
+
+
+@handler('prune_rate_limits')
+def prune_rate_limits():
+    ratelimit.prune()
+
+
+def schedule_periodic(name, delay=0):
+    Job.objects.enqueue(name, key=f'periodic:{name}', delay=delay)
+
+
+def schedule_all_periodic():
+    """Make sure every periodic job is queued; a no-op for those already pending."""
+    for name in PERIODIC:
+        schedule_periodic(name)
+
+
+def run_job(job):
+    """Run a claimed job; returns True when it completed."""
+    func = HANDLERS.get(job.name)
+    if func is None:
+        job.retry_later(f'Unknown job {job.name!r}')
+        return False
+    try:
+        with transaction.atomic():
+            func(**job.payload)
+            job.delete()
+    except Exception:
+        job.retry_later(traceback.format_exc())
+        return False
+    finally:
+        # Also after a final failure, so the next run still happens; while
+        # the job is pending for a retry its key makes this a no-op.
+        if job.name in PERIODIC:
+            schedule_periodic(job.name, delay=PERIODIC[job.name])
+    return True
+
+
+def run_pending(batch_size=10, stale_after=600):
+    """Claim and run one batch of due jobs; returns (done, failed)."""
+    done = failed = 0
+    for job in Job.objects.claim(batch_size, stale_after):
+        if run_job(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
@@ -0,0 +1,266 @@
+import copy
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.test import Client, RequestFactory
+
+from app import ratelimit, template_bundle, views
+from app.forms import AnswerForm
+from app.models import Question, RateLimitBucket
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def measure(func, requests):
+    """Call ``func`` ``requests`` times; returns per-call timings in ms."""
+    func()
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def explain_timings(queryset, requests):
+    """Server-side execution times of ``queryset`` in ms, from EXPLAIN ANALYZE."""
+    timings = []
+    for _ in range(requests):
+        plan = queryset.explain(analyze=True)
+        timings.append(float(re.search(r'Execution Time: ([\d.]+) ms', plan).group(1)))
+    return timings
+
+
+def get(client, url, **extra):
+    def fetch():
+        response = client.get(url, **extra)
+        if response.status_code >= 400:
+            raise CommandError(f'{url} returned {response.status_code}')
+    return fetch
+
+
+def busiest_question_id():
+    return Question.objects.order_by('-answers_count').values_list('id', flat=True).first()
+
+
+@scenario('api')
+def api_vs_html(command, requests):
+    """JSON API against the HTML pages it replaces for clients."""
+    question_id = busiest_question_id()
+    client = Client()
+    for name, url in [
+        ('index html', '/'),
+        ('index api', '/api/v1/questions/?limit=5'),
+        ('hot html', '/hot/'),
+        ('hot api', '/api/v1/questions/?sort=hot&limit=5'),
+        ('question html', f'/question/{question_id}/'),
+        ('answers api', f'/api/v1/questions/{question_id}/answers/?limit=5'),
+    ]:
+        command.report(name, measure(get(client, url), requests))
+
+
+@scenario('search')
+def search_annotation(command, requests):
+    """Feed and lookup queries on the lean manager against the search manager."""
+    question_id = busiest_question_id()
+    command.stdout.write(f'{Question.objects.count()} questions')
+    for name, build in [
+        ('new feed', lambda manager: manager.new()[:20]),
+        ('hot feed', lambda manager: manager.hot()[:20]),
+        ('question by id', lambda manager: manager.by_id(question_id)),
+    ]:
+        for label, manager in [('lean', Question.objects), ('search', Question.searchable)]:
+            queryset = build(manager)
+            command.report(f'{name} {label}', measure(lambda: list(queryset.all()), requests))
+            command.report(f'{name} {label} (db)', explain_timings(queryset, requests))
+
+
+@scenario('ratelimit')
+def rate_limit_overhead(command, requests):
+    """Cost of one rate-limit check (a single upsert of the client's buckets)."""
+    keys = ['bench:ip:127.0.0.1', 'bench:user:0']
+    try:
+        for name, check_keys in [('check ip', keys[:1]), ('check ip + user', keys)]:
+            command.report(name, measure(lambda: ratelimit.hit(check_keys, 1000, 1000), requests))
+        command.report('check throttled', measure(lambda: ratelimit.hit(keys, 0.001, 1), requests))
+    finally:
+        RateLimitBucket.objects.filter(key__in=keys).delete()
+
+
+def page_contexts():
+    """(page, template, request, context) for the pages rendered most, as an anonymous visitor."""
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    question_id = busiest_question_id()
+    form = AnswerForm(None, user=request.user, question=question_id)
+    return [
+        ('index', 'index.html', request, views.get_paginated_questions(request, Question.objects.new())),
+        ('hot', 'hot.html', request, views.get_paginated_questions(request, Question.objects.hot())),
+        ('question', 'question.html', request, views.get_question_context(request, question_id, form)),
+    ]
+
+
+def django_templates(dirs, cached=True):
+    """A Django template backend like settings.TEMPLATES with other dirs and loaders."""
+    options = copy.deepcopy(settings.TEMPLATES[0]['OPTIONS'])
+    loaders = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+    options['loaders'] = [('django.template.loaders.cached.Loader', loaders)] if cached else loaders
+    return DjangoTemplates({'NAME': 'bench', 'DIRS': dirs, 'APP_DIRS': False, 'OPTIONS': options})
+
+
+@scenario('templates')
+def template_rendering(command, requests):
+    """Render cost per page: uncached loader, cached loader, inlined bundle, Jinja2 port."""
+    source = settings.BASE_DIR / 'templates'
+    with tempfile.TemporaryDirectory() as bundle:
+        template_bundle.build(source, bundle)
+        backends = [
+            ('uncached', django_templates([source], cached=False)),
+            ('cached', django_templates([source])),
+            ('bundle', django_templates([bundle, source])),
+        ]
+        if 'jinja2' in [backend.name for backend in engines.all()]:
+            backends.append(('jinja2', engines['jinja2']))
+        for page, template, request, context in page_contexts():
+            for label, backend in backends:
+                # The first call also evaluates the context querysets; measure() discards it.
+                render = lambda: backend.get_template(template).render(context, request)
+                command.report(f'{page} {label}', measure(render, requests))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_memory(pid):
+    """(RSS, PSS) in MB of ``pid`` and its children, from /proc (Linux only).
+
+    PSS splits pages shared copy-on-write between the processes using them,
+    so it shows what preloading the app saves; RSS counts them in every worker.
+    """
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        pids = [pid] + [int(child) for child in f.read().split()]
+    rss = pss = 0
+    for process in pids:
+        with open(f'/proc/{process}/smaps_rollup') as f:
+            for line in f:
+                field, value = line.split()[:2]
+                if field == 'Rss:':
+                    rss += int(value)
+                elif field == 'Pss:':
+                    pss += int(value)
+    return rss / 1024, pss / 1024
+
+
+def start_gunicorn(profile, port):
+    env = dict(
+        os.environ,
+        GUNICORN_PROFILE=profile,
+        GUNICORN_BIND=f'127.0.0.1:{port}',
+        GUNICORN_ACCESS_LOG=os.devnull,
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'askme_garoev' / 'gunicorn.conf.py')],
+        cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/v1/questions/?limit=1', timeout=1)
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.terminate()
+    raise CommandError(f'gunicorn profile {profile} did not start on port {port}')
+
+
+@scenario('gunicorn')
+def gunicorn_profiles(command, requests, concurrency=8):
+    """Throughput and memory of each gunicorn.conf.py profile under concurrent load."""
+    question_id = busiest_question_id()
+    paths = ['/', '/hot/', f'/question/{question_id}/', '/api/v1/questions/?limit=5']
+    for profile in ['sync', 'gthread', 'uvicorn']:
+        port = free_port()
+        server = start_gunicorn(profile, port)
+        try:
+            urls = [f'http://127.0.0.1:{port}{path}' for path in paths]
+
+            def fetch(i):
+                started = time.perf_counter()
+                with urllib.request.urlopen(urls[i % len(urls)], timeout=30) as response:
+                    response.read()
+                return (time.perf_counter() - started) * 1000
+
+            with ThreadPoolExecutor(concurrency) as pool:
+                list(pool.map(fetch, range(len(urls) * 2)))
+                started = time.perf_counter()
+                timings = list(pool.map(fetch, range(requests)))
+                elapsed = time.perf_counter() - started
+            rss, pss = process_memory(server.pid)
+            timings.sort()
+            command.stdout.write(
+                f'{profile:<10} {requests / elapsed:8.1f} rps   mean {statistics.mean(timings):8.2f} ms'
+                f'   p95 {timings[int(len(timings) * 0.95) - 1]:8.2f} ms'
+                f'   rss {rss:7.1f} MB   pss {pss:7.1f} MB'
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+class Command(BaseCommand):
+    help = 'Measures latency and throughput of performance-sensitive code paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})"
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Iterations per measurement (default: 200)'
+        )
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        mean = statistics.mean(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{name:<30} mean {mean:8.2f} ms   p95 {p95:8.2f} ms   {1000 / mean:8.1f} rps'
+        )
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: {SCENARIOS[name].__doc__}'))
+            SCENARIOS[name](self, options['requests'])
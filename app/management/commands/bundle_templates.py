@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app import template_bundle
+
+
+class Command(BaseCommand):
+    help = 'Builds the production template bundle with static includes inlined'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=str(settings.TEMPLATE_BUNDLE_DIR),
+            help=f'Bundle directory (default: {settings.TEMPLATE_BUNDLE_DIR})'
+        )
+
+    def handle(self, *args, **options):
+        written, inlined = template_bundle.build(settings.BASE_DIR / 'templates', options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} templates written to {options['output']}, {inlined} includes inlined"
+        ))
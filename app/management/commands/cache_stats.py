@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app import objectcache
+
+
+class Command(BaseCommand):
+    help = 'Shows hit rates of the object caches, summed over all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after showing them')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'cache':<10} {'local hits':>11} {'shared hits':>12} {'misses':>8} {'hit rate':>9} {'evictions':>10}"
+        ))
+        for name, counts in objectcache.stats().items():
+            requests = counts['local_hits'] + counts['shared_hits'] + counts['misses']
+            hit_rate = (requests - counts['misses']) / requests if requests else 0
+            self.stdout.write(
+                f"{name:<10} {counts['local_hits']:>11} {counts['shared_hits']:>12} {counts['misses']:>8} "
+                f"{hit_rate:>9.1%} {counts['evictions']:>10}"
+            )
+        if options['reset']:
+            objectcache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
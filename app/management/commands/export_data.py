@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import transfer
+
+
+class Command(BaseCommand):
+    help = 'Exports users, questions, answers, tags and votes to gzip-compressed NDJSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Dump directory (created if missing)')
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted export into the same directory'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Tables exported in parallel (default: 4)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=transfer.CHUNK_SIZE,
+            help=f'Rows fetched per server-side cursor round trip (default: {transfer.CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--rows-per-file',
+            type=int,
+            default=transfer.ROWS_PER_FILE,
+            help=f'Rows per file, the unit of resumption (default: {transfer.ROWS_PER_FILE})'
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if (directory / 'manifest.json').exists() and not options['resume']:
+            raise CommandError(f'{directory} already holds a dump; pass --resume to continue it')
+        transfer.dump(
+            directory,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            rows_per_file=options['rows_per_file'],
+            progress=lambda table, rows: self.stdout.write(f'{table:<30} {rows:>10} rows'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Exported to {directory}'))
@@ -1,12 +1,13 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db import transaction
-from faker import Faker
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
 import random
 from django.core.files import File
 from pathlib import Path
 
+from app import counters
 from app.models import Question, Answer, Tag, QuestionLike, AnswerLike, Profile
 
 class Command(BaseCommand):
@@ -23,10 +24,16 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        from faker import Faker
+
         ratio = options['ratio']
         fake = Faker()
         
         with transaction.atomic():
+            # Counter triggers stay on; only their live rating events are muted.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL askme.skip_events = 'on'")
+
             self.stdout.write('Clearing existing data...')
             QuestionLike.objects.all().delete()
             AnswerLike.objects.all().delete()
@@ -101,17 +108,19 @@ class Command(BaseCommand):
                 ignore_conflicts=True
             )
 
-            question_answers_count = {q.id: 0 for q in questions}
-            
             self.stdout.write('Generating answers...')
             answers = []
+            answered = set()
             for _ in range(ratio * 100):
                 question = random.choice(questions)
+                # About half of the questions get one accepted answer.
+                is_correct = question.id not in answered and random.choice([True, False])
+                answered.add(question.id)
                 answers.append(
                     Answer(
                         content=fake.text(),
                         question=question,
-                        is_correct=random.choice([True, False]),
+                        is_correct=is_correct,
                         author=random.choice(users),
                         created_at=fake.date_time_between(
                             start_date='-1y',
@@ -120,31 +129,22 @@ class Command(BaseCommand):
                         )
                     )
                 )
-                question_answers_count[question.id] += 1
             
             answers = Answer.objects.bulk_create(answers, batch_size=self.BATCH_SIZE)
-
-            Question.objects.bulk_update([
-                Question(id=q_id, answers_count=count)
-                for q_id, count in question_answers_count.items()
-            ], ['answers_count'], batch_size=self.BATCH_SIZE)
-
-            question_likes_count = {q.id: 0 for q in questions}
-            answer_likes_count = {a.id: 0 for a in answers}
+            Question.objects.update(accepted_answer=Subquery(
+                Answer.objects.filter(question=OuterRef('pk'), is_correct=True).values('id')[:1]
+            ))
 
             self.stdout.write('Generating likes...')
             question_likes = []
             for _ in range(ratio * 100):
-                question = random.choice(questions)
-                like_type = random.choice(['like', 'dislike'])
                 question_likes.append(
                     QuestionLike(
                         author=random.choice(users),
-                        question=question,
-                        type=like_type
+                        question=random.choice(questions),
+                        type=random.choice(['like', 'dislike'])
                     )
                 )
-                question_likes_count[question.id] += 1 if like_type == 'like' else -1
 
             QuestionLike.objects.bulk_create(
                 question_likes, 
@@ -154,16 +154,13 @@ class Command(BaseCommand):
 
             answer_likes = []
             for _ in range(ratio * 100):
-                answer = random.choice(answers)
-                like_type = random.choice(['like', 'dislike'])
                 answer_likes.append(
                     AnswerLike(
                         author=random.choice(users),
-                        answer=answer,
-                        type=like_type
+                        answer=random.choice(answers),
+                        type=random.choice(['like', 'dislike'])
                     )
                 )
-                answer_likes_count[answer.id] += 1 if like_type == 'like' else -1
 
             AnswerLike.objects.bulk_create(
                 answer_likes, 
@@ -171,14 +168,7 @@ class Command(BaseCommand):
                 ignore_conflicts=True
             )
 
-            Question.objects.bulk_update([
-                Question(id=q_id, rating=count)
-                for q_id, count in question_likes_count.items()
-            ], ['rating'], batch_size=self.BATCH_SIZE)
-
-            Answer.objects.bulk_update([
-                Answer(id=a_id, rating=count)
-                for a_id, count in answer_likes_count.items()
-            ], ['rating'], batch_size=self.BATCH_SIZE)
+            self.stdout.write('Computing user stats...')
+            counters.recount(['userstats'])
 
         self.stdout.write(self.style.SUCCESS('Successfully filled database'))
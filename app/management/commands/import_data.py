@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import transfer
+
+
+class Command(BaseCommand):
+    help = 'Imports a dump made by export_data into an empty database and recounts the counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Dump directory')
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted import of the same dump'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Tables imported in parallel (default: 4)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=transfer.CHUNK_SIZE,
+            help=f'Rows inserted per statement (default: {transfer.CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not (directory / 'manifest.json').exists():
+            raise CommandError(f'{directory} has no manifest.json')
+        if not options['resume'] and ((directory / 'import-state.json').exists() or not transfer.is_empty()):
+            raise CommandError('The database already has content or this dump was partly imported; pass --resume')
+        transfer.load(
+            directory,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            progress=lambda table, rows: self.stdout.write(f'{table:<30} {rows:>10} rows'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Imported {directory}'))
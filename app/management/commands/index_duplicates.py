@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import duplicates
+
+
+class Command(BaseCommand):
+    help = 'Indexes questions for duplicate detection: those not indexed yet, or all with --rebuild'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop the index and build it again, needed after changing its parameters'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Questions indexed per transaction (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        if options['rebuild']:
+            count = duplicates.rebuild(options['batch_size'])
+        else:
+            count = duplicates.index_missing(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} questions'))
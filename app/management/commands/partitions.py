@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from app import partitions
+
+
+class Command(BaseCommand):
+    help = 'Shows vote table partitions, verifies partition pruning and changes the partition count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tables',
+            nargs='*',
+            help=f"Tables to act on (default: all of {', '.join(partitions.PARTITIONED)})"
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Check that the page queries read only the partitions of their targets'
+        )
+        parser.add_argument(
+            '--repartition',
+            type=int,
+            metavar='N',
+            help='Rebuild the tables with N hash partitions (0: unpartitioned); blocks writes while copying'
+        )
+
+    def handle(self, *args, **options):
+        tables = options['tables'] or list(partitions.PARTITIONED)
+        unknown = [table for table in tables if table not in partitions.PARTITIONED]
+        if unknown:
+            raise CommandError(f"Unknown tables: {', '.join(unknown)}")
+
+        if options['repartition'] is not None:
+            with transaction.atomic(), connection.cursor() as cursor:
+                for table in tables:
+                    partitions.rebuild(cursor, table, partitions.PARTITIONED[table], options['repartition'] or None)
+                    self.stdout.write(f"{table}: {options['repartition']} partitions")
+
+        if options['verify']:
+            self.verify()
+        else:
+            self.status(tables)
+
+    def status(self, tables):
+        for table in tables:
+            rows = partitions.partitions(table)
+            layout = f'{len(rows)} partitions' if rows else 'not partitioned'
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{table} by {partitions.PARTITIONED[table]}: {layout}'))
+            total = sum(count for _, count, _ in rows)
+            for name, count, size in rows:
+                share = count / total * 100 if total else 0
+                self.stdout.write(f'{name:<30} {count:>10} rows {share:6.1f}%   {size / 1024 / 1024:8.1f} MB')
+
+    def verify(self):
+        failed = False
+        for name, scanned, targets in partitions.verify():
+            pruned = len(scanned) <= len(set(targets))
+            failed |= not pruned
+            line = f"{name:<25} {len(scanned)} partitions for {len(set(targets))} targets: {', '.join(sorted(scanned))}"
+            self.stdout.write(line if pruned else self.style.ERROR(line))
+        if failed:
+            raise CommandError('Some queries read partitions of other targets')
+        self.stdout.write(self.style.SUCCESS('All vote lookups prune to their targets'))
@@ -0,0 +1,125 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter started with -X importtime. Phase markers go to
+# stderr between the import lines, so imports are attributed to the phase
+# that triggered them; timings go to stdout as JSON.
+BOOT = """
+import json, sys, time
+started = time.perf_counter()
+timings = {}
+
+def phase(name):
+    timings[name] = (time.perf_counter() - started) * 1000
+    print('phase:' + name, file=sys.stderr, flush=True)
+
+phase('interpreter')
+import django
+django.setup()
+phase('setup')
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+phase('application')
+from django.test import Client
+client = Client()
+status = client.get(%(path)r).status_code
+phase('first request')
+client.get(%(path)r)
+phase('second request')
+print(json.dumps({'timings': timings, 'status': status}))
+"""
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+PHASES = ['interpreter', 'setup', 'application', 'first request', 'second request']
+
+
+def package(module):
+    """Group key: django.contrib.admin.options -> django.contrib.admin, faker.providers -> faker."""
+    parts = module.split('.')
+    if parts[0] != 'django':
+        return parts[0]
+    return '.'.join(parts[:3 if parts[1:2] == ['contrib'] else 2])
+
+
+def parse_importtime(stderr):
+    """Returns ({phase: self µs}, {package: self µs}, [(cumulative µs, module)] of top-level imports)."""
+    by_phase = defaultdict(int)
+    by_package = defaultdict(int)
+    top_level = []
+    current = PHASES[0]
+    for line in stderr.splitlines():
+        if line.startswith('phase:'):
+            # Imports printed before a marker belong to the phase it closes.
+            following = PHASES.index(line[len('phase:'):]) + 1
+            current = PHASES[min(following, len(PHASES) - 1)]
+            continue
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, module = match.groups()
+        by_phase[current] += int(own)
+        by_package[package(module)] += int(own)
+        if not indent:
+            top_level.append((int(cumulative), module))
+    return by_phase, by_package, top_level
+
+
+class Command(BaseCommand):
+    help = 'Profiles worker startup: import time by package and time to first request'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='/',
+            help='URL of the first request (default: /)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Packages and modules to list (default: 15)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT % {'path': options['path']}],
+            cwd=settings.BASE_DIR, env=dict(os.environ), capture_output=True, text=True,
+        )
+        wall = (time.perf_counter() - started) * 1000
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        by_phase, by_package, top_level = parse_importtime(result.stderr)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Time to first request ({options['path']} -> {report['status']})"))
+        timings = report['timings']
+        # Interpreter startup and exit happen outside the script's own clock.
+        timings['interpreter'] = wall - timings['second request']
+        previous = 0
+        for name in PHASES:
+            elapsed = timings[name] if name == 'interpreter' else timings['interpreter'] + timings[name]
+            self.stdout.write(
+                f'{name:<20} {elapsed - previous:8.1f} ms   imports {by_phase[name] / 1000:8.1f} ms'
+                f'   at {elapsed:8.1f} ms'
+            )
+            previous = elapsed
+        self.stdout.write(f"{'process wall time':<20} {wall:8.1f} ms")
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time by package (self)'))
+        for name, own in sorted(by_package.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'{name:<40} {own / 1000:8.1f} ms')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Slowest top-level imports (cumulative)'))
+        for cumulative, module in sorted(top_level, reverse=True)[:options['top']]:
+            self.stdout.write(f'{module:<40} {cumulative / 1000:8.1f} ms')
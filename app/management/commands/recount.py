@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds denormalized counters from the source tables and reports drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'counters',
+            nargs='*',
+            help=f"Counters or models to rebuild (default: all of {', '.join(c.name for c in counters.COUNTERS)})"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drifted rows, change nothing'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = counters.recount(options['counters'], dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        verb = 'drifted' if options['dry_run'] else 'fixed'
+        for name, rows in results:
+            line = f'{name:<40} {rows:>8} {verb}'
+            self.stdout.write(self.style.WARNING(line) if rows else line)
+        total = sum(rows for _, rows in results)
+        self.stdout.write(self.style.SUCCESS(f'{total} rows {verb}'))
@@ -0,0 +1,91 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import replay
+
+
+class Command(BaseCommand):
+    help = 'Replays a recorded traffic log against a running instance and reports latency per URL pattern'
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='Traffic log (NDJSON) or gunicorn access log, see --format')
+        parser.add_argument(
+            '--format',
+            choices=['jsonl', 'access'],
+            default='jsonl',
+            help='jsonl: traffic log records; access: gunicorn access log (default: jsonl)'
+        )
+        parser.add_argument(
+            '--convert-to',
+            metavar='PATH',
+            help='Write the log as traffic log records to PATH instead of replaying it'
+        )
+        parser.add_argument(
+            '--base-url',
+            default='http://127.0.0.1:8000',
+            help='Instance to replay against (default: http://127.0.0.1:8000)'
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=1.0,
+            help='Rate relative to the recording: 2 replays twice as fast, 0 as fast as possible (default: 1)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Requests in flight at most (default: 8)'
+        )
+        parser.add_argument('--limit', type=int, help='Replay at most this many requests')
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0 or options['concurrency'] < 1:
+            raise CommandError('--speed must not be negative and --concurrency must be positive')
+        try:
+            log = open(options['log'], encoding='utf-8')
+        except OSError as error:
+            raise CommandError(error)
+        with log:
+            records = replay.parse_access_log(log) if options['format'] == 'access' else replay.read_log(log)
+            if options['convert_to']:
+                self.convert(records, options['convert_to'])
+                return
+            results, skipped = replay.replay(
+                records,
+                options['base_url'],
+                speed=options['speed'],
+                concurrency=options['concurrency'],
+                limit=options['limit'],
+            )
+        if not results:
+            raise CommandError('Nothing to replay')
+        self.report(replay.summarize(results), skipped)
+
+    def convert(self, records, path):
+        count = 0
+        with open(path, 'w', encoding='utf-8') as output:
+            for record in records:
+                output.write(json.dumps(record) + '\n')
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} requests to {path}'))
+
+    def report(self, summary, skipped):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'pattern':<45} {'requests':>8} {'errors':>7} {'4xx':>5} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'queries':>8} {'q/req':>6}"
+        ))
+        for pattern, stats in summary.items():
+            queries = stats['queries']
+            line = (
+                f"{pattern:<45} {stats['requests']:>8} {stats['errors'] / stats['requests']:>7.1%} "
+                f"{stats['client_errors']:>5} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+                f"{stats['p99']:>8.1f} {stats['max']:>8.1f} "
+                + (f"{queries:>8} {queries / stats['requests']:>6.1f}" if queries is not None else f"{'-':>8} {'-':>6}")
+            )
+            self.stdout.write(self.style.ERROR(line) if stats['errors'] else line)
+        total = summary['total']
+        self.stdout.write(f"Latency in ms. Sent up to {total['lag_p95']:.1f} ms late (p95); skipped {skipped} requests.")
+        if total['queries'] is None:
+            self.stdout.write(self.style.WARNING('No query counts: start the instance with ASKME_QUERY_COUNT=1'))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.jobs import run_pending, schedule_all_periodic
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (avatar resizing, related questions, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Jobs claimed per round (default: 10)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty (default: 1)'
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Seconds after which a running job is considered lost (default: 600)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Running jobs...')
+        schedule_all_periodic()
+        try:
+            while True:
+                done, failed = run_pending(options['batch_size'], options['stale_after'])
+                if done or failed:
+                    self.stdout.write(f'Done: {done}, failed: {failed}')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Job worker stopped'))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+
+class QueryCountMiddleware:
+    """Report the SQL statements run for a request in an X-DB-Queries header.
+
+    Only installed when settings.QUERY_COUNT_HEADER is on (ASKME_QUERY_COUNT=1);
+    the replay harness uses it to total database work per URL pattern.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_COUNT_HEADER:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+        response['X-DB-Queries'] = str(queries)
+        return response
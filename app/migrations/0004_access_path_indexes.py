@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'created_at', 'id'], name='answer_question_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(condition=models.Q(('is_correct', True)), fields=['question', 'created_at'], name='answer_correct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answerlike',
+            index=models.Index(fields=['author', 'answer'], name='answerlike_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='questionlike',
+            index=models.Index(fields=['author', 'question'], name='questionlike_author_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='answer',
+            name='answer_created_at_idx',
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='question',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='app.question'),
+        ),
+        migrations.AlterField(
+            model_name='answerlike',
+            name='answer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='app.answer'),
+        ),
+        migrations.AlterField(
+            model_name='answerlike',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='answer_likes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='questionlike',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='question_likes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='questionlike',
+            name='question',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='app.question'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('app', '0004_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('questions_count', models.IntegerField(default=0)),
+                ('answers_count', models.IntegerField(default=0)),
+                ('accepted_answers_count', models.IntegerField(default=0)),
+                ('rating', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='answer_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='question_author_idx'),
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO app_userstats (user_id, questions_count, answers_count, accepted_answers_count, rating)
+            SELECT u.id,
+                   COALESCE(q.questions_count, 0),
+                   COALESCE(a.answers_count, 0),
+                   COALESCE(a.accepted_answers_count, 0),
+                   COALESCE(q.rating, 0) + COALESCE(a.rating, 0)
+            FROM auth_user u
+            LEFT JOIN (
+                SELECT author_id, COUNT(*) AS questions_count, SUM(rating) AS rating
+                FROM app_question GROUP BY author_id
+            ) q ON q.author_id = u.id
+            LEFT JOIN (
+                SELECT author_id, COUNT(*) AS answers_count,
+                       COUNT(*) FILTER (WHERE is_correct) AS accepted_answers_count,
+                       SUM(rating) AS rating
+                FROM app_answer GROUP BY author_id
+            ) a ON a.author_id = u.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0005_userstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReputationBucket',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('week', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='reputation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['-reputation', 'user'], name='userstats_reputation_idx'),
+        ),
+        migrations.AddField(
+            model_name='reputationbucket',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reputation_buckets', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='reputationbucket',
+            index=models.Index(fields=['week', '-points', 'user'], name='reputation_week_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reputationbucket',
+            index=models.Index(fields=['user'], name='reputation_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reputationbucket',
+            constraint=models.UniqueConstraint(fields=('week', 'user'), name='reputation_bucket_week_user_uniq'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE app_userstats s
+            SET reputation = s.answers_count * 1 + s.accepted_answers_count * 15
+                + COALESCE((
+                    SELECT SUM(CASE WHEN v.type = 'like' THEN 5 ELSE -2 END)
+                    FROM app_questionlike v JOIN app_question t ON t.id = v.question_id
+                    WHERE t.author_id = s.user_id
+                ), 0)
+                + COALESCE((
+                    SELECT SUM(CASE WHEN v.type = 'like' THEN 10 ELSE -2 END)
+                    FROM app_answerlike v JOIN app_answer t ON t.id = v.answer_id
+                    WHERE t.author_id = s.user_id
+                ), 0)
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+VOTE = "CASE type WHEN 'like' THEN 1 WHEN 'dislike' THEN -1 ELSE 0 END"
+
+# Events are skipped while bulk loading: SET LOCAL askme.skip_events = 'on'.
+NOTIFY = "current_setting('askme.skip_events', true) IS DISTINCT FROM 'on'"
+
+
+def counter_function(name, key, delta, target, column, returning=None, payload=None):
+    """Keep ``target.column`` equal to SUM(delta) of the source rows grouped by ``key``.
+
+    Runs once per statement over its transition tables, so a bulk insert,
+    queryset delete or upsert costs one grouped UPDATE of the target.
+    """
+    def apply(changes):
+        update = (
+            f'UPDATE {target} t SET {column} = t.{column} + d.delta '
+            f'FROM (SELECT key, SUM(delta) AS delta FROM ({changes}) c GROUP BY key HAVING SUM(delta) <> 0) d '
+            f'WHERE t.id = d.key'
+        )
+        if payload is None:
+            return f'{update};'
+        return (
+            f'FOR r IN {update} RETURNING {returning} LOOP '
+            f"IF notify THEN PERFORM pg_notify('askme_events', {payload}); END IF; "
+            f'END LOOP;'
+        )
+
+    inserted = f'SELECT {key} AS key, {delta} AS delta FROM new_rows'
+    deleted = f'SELECT {key} AS key, -({delta}) AS delta FROM old_rows'
+    return f"""
+        CREATE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            r record;
+            notify boolean := {NOTIFY};
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {apply(inserted)}
+            ELSIF TG_OP = 'DELETE' THEN
+                {apply(deleted)}
+            ELSE
+                {apply(f'{inserted} UNION ALL {deleted}')}
+            END IF;
+            RETURN NULL;
+        END $$;
+    """
+
+
+def counter_triggers(name, source):
+    return f"""
+        CREATE TRIGGER {name}_insert AFTER INSERT ON {source}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+        CREATE TRIGGER {name}_update AFTER UPDATE ON {source}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+        CREATE TRIGGER {name}_delete AFTER DELETE ON {source}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {name}();
+    """
+
+
+def rating_event(question, target):
+    return (
+        f"json_build_object('question', {question}, 'event', 'rating', 'data', "
+        f"json_build_object('target', '{target}', 'id', r.id, 'rating', r.rating))::text"
+    )
+
+
+COUNTERS = [
+    # (function name, source table, SQL for the function)
+    ('app_answer_counters', 'app_answer', counter_function(
+        'app_answer_counters', 'question_id', '1', 'app_question', 'answers_count',
+    )),
+    ('app_questionlike_counters', 'app_questionlike', counter_function(
+        'app_questionlike_counters', 'question_id', VOTE, 'app_question', 'rating',
+        returning='t.id, t.rating', payload=rating_event('r.id', 'question'),
+    )),
+    ('app_answerlike_counters', 'app_answerlike', counter_function(
+        'app_answerlike_counters', 'answer_id', VOTE, 'app_answer', 'rating',
+        returning='t.id, t.question_id, t.rating', payload=rating_event('r.question_id', 'answer'),
+    )),
+    ('app_question_tags_counters', 'app_question_tags', counter_function(
+        'app_question_tags_counters', 'tag_id', '1', 'app_tag', 'questions_count',
+    )),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_reputation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='questions_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-questions_count'], name='tag_questions_count_idx'),
+        ),
+        migrations.RunSQL(
+            ''.join(function + counter_triggers(name, source) for name, source, function in COUNTERS),
+            ''.join(
+                f'DROP TRIGGER {name}_insert ON {source}; '
+                f'DROP TRIGGER {name}_update ON {source}; '
+                f'DROP TRIGGER {name}_delete ON {source}; '
+                f'DROP FUNCTION {name}(); '
+                for name, source, _ in COUNTERS
+            ),
+        ),
+        # Start from exact values: counters patched by earlier fill_db runs drifted.
+        migrations.RunSQL(
+            f"""
+            UPDATE app_question q SET
+                answers_count = (SELECT COUNT(*) FROM app_answer a WHERE a.question_id = q.id),
+                rating = COALESCE((SELECT SUM({VOTE}) FROM app_questionlike v WHERE v.question_id = q.id), 0);
+            UPDATE app_answer a SET
+                rating = COALESCE((SELECT SUM({VOTE}) FROM app_answerlike v WHERE v.answer_id = a.id), 0);
+            UPDATE app_tag t SET
+                questions_count = (SELECT COUNT(*) FROM app_question_tags qt WHERE qt.tag_id = t.id);
+            DELETE FROM app_job WHERE name IN ('recount_answers', 'recount_rating');
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
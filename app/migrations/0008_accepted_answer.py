@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_counter_triggers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='accepted_answer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.answer'),
+        ),
+        # One accepted answer per question: keep the earliest correct one and
+        # take the others' acceptance back out of their authors' stats.
+        migrations.RunSQL(
+            """
+            UPDATE app_question q SET accepted_answer_id = accepted.id
+            FROM (
+                SELECT DISTINCT ON (question_id) question_id, id FROM app_answer
+                WHERE is_correct ORDER BY question_id, created_at, id
+            ) accepted
+            WHERE q.id = accepted.question_id;
+            WITH cleared AS (
+                UPDATE app_answer a SET is_correct = false
+                FROM app_question q
+                WHERE q.id = a.question_id AND a.is_correct AND a.id <> q.accepted_answer_id
+                RETURNING a.author_id
+            )
+            UPDATE app_userstats s SET
+                accepted_answers_count = s.accepted_answers_count - c.total,
+                reputation = s.reputation - 15 * c.total
+            FROM (SELECT author_id, COUNT(*) AS total FROM cleared GROUP BY author_id) c
+            WHERE s.user_id = c.author_id;
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_accepted_answer'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['name'], name='tag_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='app_tag_name_c400d7_idx',
+        ),
+    ]
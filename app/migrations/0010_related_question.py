@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_tag_name_prefix_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedQuestion',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('rank', models.SmallIntegerField()),
+                ('score', models.FloatField()),
+                ('question', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.question')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='app.question')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='relatedquestion',
+            constraint=models.UniqueConstraint(fields=('question', 'rank'), name='related_question_rank_uniq'),
+        ),
+    ]
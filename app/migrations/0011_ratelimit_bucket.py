@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_related_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        # Buckets are disposable: skip the WAL, a crash just resets them.
+        migrations.RunSQL(
+            'ALTER TABLE app_ratelimitbucket SET UNLOGGED',
+            'ALTER TABLE app_ratelimitbucket SET LOGGED',
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:05
+
+from django.db import migrations
+
+# (table, partition key); see app/partitions.py.
+VOTE_TABLES = [
+    ('app_questionlike', 'question_id'),
+    ('app_answerlike', 'answer_id'),
+]
+PARTITIONS = 8
+
+
+# A frozen copy of app.partitions.rebuild as of this migration: importing
+# the app module would import the live models, and later changes to it
+# must not change what this migration does.
+def rebuild(cursor, table, key, modulus=None):
+    """Recreate ``table`` hash-partitioned by ``key`` into ``modulus`` partitions.
+
+    With ``modulus=None`` the table becomes a plain one again. Rows,
+    constraints, indexes, triggers and the id sequence are carried over
+    under the same names. Runs in the caller's transaction; writes to the
+    table are blocked until it commits.
+    """
+    new = f'{table}__new'
+    # Pending deferred foreign key checks of earlier writes would block DROP TABLE.
+    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+    cursor.execute(
+        'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint '
+        "WHERE conrelid = %s::regclass ORDER BY contype = 'p' DESC",
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        'SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN '
+        '(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)',
+        [table, table],
+    )
+    indexes = [definition for definition, in cursor.fetchall()]
+    cursor.execute(
+        'SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal',
+        [table],
+    )
+    triggers = [definition for definition, in cursor.fetchall()]
+
+    partition_by = f' PARTITION BY HASH ({key})' if modulus else ''
+    cursor.execute(f'CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS INCLUDING IDENTITY){partition_by}')
+    for remainder in range(modulus or 0):
+        cursor.execute(
+            f'CREATE TABLE {new}_p{remainder} PARTITION OF {new} '
+            f'FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})'
+        )
+    cursor.execute(f'INSERT INTO {new} SELECT * FROM {table}')
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{new}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {new}"
+    )
+
+    cursor.execute(f'DROP TABLE {table}')
+    cursor.execute(f'ALTER TABLE {new} RENAME TO {table}')
+    cursor.execute(f"SELECT pg_get_serial_sequence('{table}', 'id')")
+    cursor.execute(f'ALTER SEQUENCE {cursor.fetchone()[0]} RENAME TO {table}_id_seq')
+    for remainder in range(modulus or 0):
+        cursor.execute(f'ALTER TABLE {new}_p{remainder} RENAME TO {table}_p{remainder}')
+
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = f'PRIMARY KEY (id, {key})' if modulus else 'PRIMARY KEY (id)'
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+    for definition in indexes + triggers:
+        cursor.execute(definition)
+    cursor.execute(f'ANALYZE {table}')
+
+
+
+def partition_votes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table, key in VOTE_TABLES:
+            rebuild(cursor, table, key, PARTITIONS)
+
+
+def unpartition_votes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table, key in VOTE_TABLES:
+            rebuild(cursor, table, key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_ratelimit_bucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_votes, unpartition_votes),
+    ]
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.db import migrations
+
+
+def database_caches():
+    return [caches[alias] for alias in settings.CACHES if isinstance(caches[alias], DatabaseCache)]
+
+
+def create_cache_tables(apps, schema_editor):
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+    # Cache entries are disposable: skip the WAL, a crash just empties the cache.
+    for cache in database_caches():
+        schema_editor.execute(f'ALTER TABLE {schema_editor.quote_name(cache._table)} SET UNLOGGED')
+
+
+def drop_cache_tables(apps, schema_editor):
+    for cache in database_caches():
+        schema_editor.execute(f'DROP TABLE IF EXISTS {schema_editor.quote_name(cache._table)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_partition_votes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, drop_cache_tables),
+    ]
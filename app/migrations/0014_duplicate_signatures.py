@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSignature',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='duplicate_signature', serialize=False, to='app.question')),
+                ('title_signature', models.BinaryField(null=True)),
+                ('content_signature', models.BinaryField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionBucket',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('bucket', models.BigIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket', 'question'], name='question_bucket_idx')],
+            },
+        ),
+    ]
@@ -1,8 +1,28 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import connection, models, IntegrityError, transaction
 from django.contrib.auth.models import User
-from django.db.models import Count
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from app import events
+
+VOTE_VALUES = {'like': 1, 'dislike': -1}
+
+# Reputation earned by the author of the voted, posted or accepted item.
+VOTE_REPUTATION = {
+    'question': {'like': 5, 'dislike': -2},
+    'answer': {'like': 10, 'dislike': -2},
+}
+ANSWER_REPUTATION = 1
+ACCEPTED_REPUTATION = 15
+
+
+def current_week():
+    today = timezone.localdate()
+    return today - timedelta(days=today.weekday())
 
-from django.contrib.postgres.search import SearchVector
 
 class ProfileManager(models.Manager):
     def get_queryset(self):
@@ -10,13 +30,10 @@ class ProfileManager(models.Manager):
         queryset = queryset.select_related('user')
         return queryset
     
-    def get_top_profiles_by_rating(self):
-        # rating=models.Sum('user__questions__rating') + models.Sum
-        #     ('user__answers__rating')
-        # ).order_by('-rating')[:5]
-        return self.get_queryset().annotate(
-            answers_count=models.Count('user__answers')
-        ).order_by('-answers_count')[:5]
+    def get_top_profiles_by_reputation(self, limit=5):
+        return self.get_queryset().filter(user__stats__isnull=False).order_by(
+            '-user__stats__reputation', 'user__stats__user_id'
+        )[:limit]
     
     def by_id(self, profile_id):
         return self.get_queryset().filter(id=profile_id)
@@ -34,11 +51,16 @@ class Profile(models.Model):
     
 class TagManager(models.Manager):
     def top_tags_by_questions_count(self):
-        return self.get_queryset().annotate(questions_count=models.Count('questions')).order_by('-questions_count')[:5]
+        return self.get_queryset().order_by('-questions_count')[:5]
+
+    def suggest(self, prefix, limit):
+        return self.get_queryset().filter(name__startswith=prefix).order_by('-questions_count', 'name')[:limit]
 
 class Tag(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
+    # Maintained by a database trigger on the question-tag table.
+    questions_count = models.IntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -47,7 +69,9 @@ class Tag(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['name']),
+            # Pattern ops serve both equality and LIKE 'prefix%' in any collation.
+            models.Index(fields=['name'], opclasses=['varchar_pattern_ops'], name='tag_name_prefix_idx'),
+            models.Index(fields=['-questions_count'], name='tag_questions_count_idx'),
         ]
 
 class QuestionManager(models.Manager):
@@ -68,6 +92,67 @@ class QuestionManager(models.Manager):
     def by_id(self, question_id):
         return self.get_queryset().filter(id=question_id)
 
+    def by_author(self, user_id):
+        return self.get_queryset().filter(author_id=user_id).order_by('-created_at', '-id')
+
+    def related(self, question_id):
+        return self.get_queryset().filter(
+            related_entries__question_id=question_id
+        ).order_by('related_entries__rank')
+
+    def toggle_accepted(self, question_id, answer_id, user_id):
+        """Accept the answer, or un-accept it if it already is, on behalf of ``user_id``.
+
+        One statement checks that the user asked the question, moves the
+        question's pointer and syncs ``is_correct`` of the previously and newly
+        accepted answers. Returns the changed answers as
+        [(answer_id, author_id, is_correct)]; empty if the answer does not
+        belong to the question or the user is not its author.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH target AS (
+                    SELECT q.id, q.accepted_answer_id AS previous_id, a.id AS answer_id
+                    FROM {self.model._meta.db_table} q
+                    JOIN {Answer._meta.db_table} a ON a.question_id = q.id
+                    WHERE q.id = %(question)s AND a.id = %(answer)s AND q.author_id = %(user)s
+                    FOR UPDATE OF q
+                ), toggled AS (
+                    UPDATE {self.model._meta.db_table} q
+                    SET accepted_answer_id = CASE WHEN t.previous_id = t.answer_id THEN NULL ELSE t.answer_id END
+                    FROM target t WHERE q.id = t.id
+                    RETURNING q.accepted_answer_id
+                )
+                UPDATE {Answer._meta.db_table} a
+                SET is_correct = COALESCE(a.id = toggled.accepted_answer_id, false)
+                FROM target t, toggled
+                WHERE a.id IN (t.answer_id, t.previous_id)
+                RETURNING a.id, a.author_id, a.is_correct
+            """, {'question': question_id, 'answer': answer_id, 'user': user_id})
+            return cursor.fetchall()
+
+class QuestionSearchManager(QuestionManager):
+    """Questions annotated with their full-text ``search`` vector.
+
+    The vector is computed per row, so only search requests should pay
+    for it; feeds and write paths use the default manager. The postgres
+    search module is imported on first use to keep it out of worker startup.
+    """
+    def get_queryset(self):
+        from django.contrib.postgres.search import SearchVector
+
+        queryset = super().get_queryset()
+        queryset = queryset.annotate(search=SearchVector("title", "content"))
+        return queryset
+
+    def search(self, text):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(text)
+        return self.get_queryset().filter(search=query).annotate(
+            rank=SearchRank(F('search'), query)
+        ).order_by('-rank', '-id')
+
 class Question(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=255)
@@ -75,12 +160,18 @@ class Question(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     tags = models.ManyToManyField(Tag, related_name='questions')
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='questions')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='questions', db_index=False)
     likes = models.ManyToManyField(User, through='QuestionLike', related_name='liked_questions_set')
+    # Both maintained by database triggers on the answer and vote tables.
     rating = models.IntegerField(default=0)
     answers_count = models.IntegerField(default=0)
+    # The answer marked correct by the question author; its is_correct is set too.
+    accepted_answer = models.ForeignKey(
+        'Answer', null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
 
-    objects = QuestionManager().annotate(search=SearchVector("title", "content"))
+    objects = QuestionManager()
+    searchable = QuestionSearchManager()
 
     def __str__(self):
         return self.title
@@ -92,6 +183,55 @@ class Question(models.Model):
         indexes = [
             models.Index(fields=['-created_at'], name='question_created_at_idx'),
             models.Index(fields=['-rating', '-created_at'], name='question_hot_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='question_author_idx'),
+        ]
+
+class RelatedQuestion(models.Model):
+    """One of the most similar questions to ``question``; rebuilt periodically by app.related."""
+    id = models.AutoField(primary_key=True)
+    # Lookups by question use the unique (question, rank) index.
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+', db_index=False)
+    related = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='related_entries')
+    rank = models.SmallIntegerField()
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.question_id} ~ {self.related_id} ({self.score:.2f})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'rank'], name='related_question_rank_uniq'),
+        ]
+
+
+class QuestionSignature(models.Model):
+    """MinHash signatures of a question's title and content, see app.duplicates.
+
+    A signature is None when its text has too few words to compare.
+    """
+    question = models.OneToOneField(
+        Question, primary_key=True, on_delete=models.CASCADE, related_name='duplicate_signature'
+    )
+    title_signature = models.BinaryField(null=True)
+    content_signature = models.BinaryField(null=True)
+
+    def __str__(self):
+        return f"Signature of {self.question_id}"
+
+
+class QuestionBucket(models.Model):
+    """One LSH band of a question's signatures: questions sharing a bucket are duplicate candidates."""
+    id = models.AutoField(primary_key=True)
+    bucket = models.BigIntegerField()
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+
+    def __str__(self):
+        return f"{self.question_id} in {self.bucket}"
+
+    class Meta:
+        indexes = [
+            # Candidate lookups are index-only scans.
+            models.Index(fields=['bucket', 'question'], name='question_bucket_idx'),
         ]
 
 class AnswerManager(models.Manager):
@@ -110,7 +250,21 @@ class AnswerManager(models.Manager):
         return self.get_queryset().filter(id=answer_id)
 
     def by_question(self, question_id):
-        return self.get_queryset().filter(question_id=question_id).order_by('created_at')
+        return self.get_queryset().filter(question_id=question_id).order_by('created_at', 'id')
+
+    def by_author(self, user_id):
+        return self.get_queryset().filter(author_id=user_id).order_by('-created_at', '-id')
+
+    def with_position(self):
+        earlier = Answer.objects.filter(question_id=models.OuterRef('question_id')).filter(
+            Q(created_at__lt=models.OuterRef('created_at'))
+            | Q(created_at=models.OuterRef('created_at'), id__lt=models.OuterRef('id'))
+        ).order_by().values('question_id').annotate(total=Count('id')).values('total')
+        return self.get_queryset().annotate(position=Coalesce(models.Subquery(earlier), 0))
+
+    def location(self, answer_id):
+        """Return (question_id, position among the question's answers) in one query."""
+        return self.with_position().filter(id=answer_id).values_list('question_id', 'position').first()
 
 class Answer(models.Model):
     id = models.AutoField(primary_key=True)
@@ -118,9 +272,11 @@ class Answer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_correct = models.BooleanField(default=False)
     
-    question = models.ForeignKey(Question, related_name='answers', on_delete=models.CASCADE)
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answers')
+    # Indexed by answer_question_created_idx instead of a standalone FK index.
+    question = models.ForeignKey(Question, related_name='answers', on_delete=models.CASCADE, db_index=False)
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answers', db_index=False)
     likes = models.ManyToManyField(User, through='AnswerLike', related_name='liked_answers_set')
+    # Maintained by a database trigger on the vote table.
     rating = models.IntegerField(default=0)
 
     objects = AnswerManager()
@@ -132,57 +288,76 @@ class Answer(models.Model):
         return self.likes.filter(id=user).exists()
     
     def save(self, *args, **kwargs):
-        Question.objects.filter(pk=self.question_id).update(
-            answers_count=models.F('answers_count') + 1
-        )
+        is_new = self.pk is None
         super().save(*args, **kwargs)
+        if is_new:
+            UserStats.objects.add(
+                self.author_id,
+                answers_count=1,
+                accepted_answers_count=int(self.is_correct),
+                reputation=ANSWER_REPUTATION + ACCEPTED_REPUTATION * int(self.is_correct),
+            )
+            events.publish(self.question_id, 'answer', id=self.id)
 
     def delete(self, *args, **kwargs):
-        question_id = self.question_id
+        vote_reputation = sum(
+            VOTE_REPUTATION['answer'][vote_type] * count
+            for vote_type, count in AnswerLike.objects.filter(answer_id=self.id)
+            .values_list('type').annotate(count=Count('id')).order_by()
+        )
         result = super().delete(*args, **kwargs)
-        Question.objects.filter(pk=question_id).update(
-            answers_count=models.F('answers_count') - 1
+        UserStats.objects.add(
+            self.author_id,
+            answers_count=-1,
+            accepted_answers_count=-int(self.is_correct),
+            rating=-self.rating,
+            reputation=-(ANSWER_REPUTATION + ACCEPTED_REPUTATION * int(self.is_correct) + vote_reputation),
         )
         return result
 
     class Meta:
         indexes = [
-            models.Index(fields=['-created_at'], name='answer_created_at_idx'),
             models.Index(fields=['created_at'], name='answer_created_at_asc_idx'),
+            models.Index(fields=['question', 'created_at', 'id'], name='answer_question_created_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='answer_author_idx'),
+            models.Index(
+                fields=['question', 'created_at'],
+                name='answer_correct_idx',
+                condition=Q(is_correct=True),
+            ),
         ]
 
 class QuestionLike(models.Model):
     id = models.AutoField(primary_key=True)
     type = models.CharField(max_length=10, choices=[('like', 'like'), ('dislike', 'dislike')])
-    question = models.ForeignKey(Question, on_delete=models.CASCADE)
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='question_likes')
+    # Lookups by question use the unique (question, author) index.
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, db_index=False)
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='question_likes', db_index=False)
 
     class Meta:
         unique_together = ['question', 'author']
+        indexes = [
+            models.Index(fields=['author', 'question'], name='questionlike_author_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs)
         if is_new:
-            if self.type == 'like':
-                Question.objects.filter(pk=self.question_id).update(
-                    rating=models.F('rating') + 1
-                )   
-            else:
-                Question.objects.filter(pk=self.question_id).update(
-                    rating=models.F('rating') - 1
-                )
+            UserStats.objects.add(
+                self.question.author_id,
+                rating=VOTE_VALUES[self.type],
+                reputation=VOTE_REPUTATION['question'][self.type],
+            )
 
     def delete(self, *args, **kwargs):
-        if self.type == 'like': 
-            Question.objects.filter(pk=self.question_id).update(
-                rating=models.F('rating') - 1
-            )
-        else:
-            Question.objects.filter(pk=self.question_id).update(
-                rating=models.F('rating') + 1
-            )
-        return super().delete(*args, **kwargs)
+        result = super().delete(*args, **kwargs)
+        UserStats.objects.add(
+            self.question.author_id,
+            rating=-VOTE_VALUES[self.type],
+            reputation=-VOTE_REPUTATION['question'][self.type],
+        )
+        return result
 
     def __str__(self):
         return f"{self.author.username} liked {self.question.title[:10]}..."
@@ -190,35 +365,241 @@ class QuestionLike(models.Model):
 class AnswerLike(models.Model):
     id = models.AutoField(primary_key=True)  
     type = models.CharField(max_length=10, choices=[('like', 'like'), ('dislike', 'dislike')])
-    answer = models.ForeignKey(Answer, on_delete=models.CASCADE)
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answer_likes')
+    # Lookups by answer use the unique (answer, author) index.
+    answer = models.ForeignKey(Answer, on_delete=models.CASCADE, db_index=False)
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='answer_likes', db_index=False)
 
     class Meta:
         unique_together = ['answer', 'author']
+        indexes = [
+            models.Index(fields=['author', 'answer'], name='answerlike_author_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs)
         if is_new:
-            if self.type == 'like': 
-                Answer.objects.filter(pk=self.answer_id).update(
-                    rating=models.F('rating') + 1
-                )
-            else:
-                Answer.objects.filter(pk=self.answer_id).update(
-                    rating=models.F('rating') - 1
-                )
+            UserStats.objects.add(
+                self.answer.author_id,
+                rating=VOTE_VALUES[self.type],
+                reputation=VOTE_REPUTATION['answer'][self.type],
+            )
     
     def delete(self, *args, **kwargs):
-        if self.type == 'like':
-            Answer.objects.filter(pk=self.answer_id).update(
-                rating=models.F('rating') - 1
+        result = super().delete(*args, **kwargs)
+        UserStats.objects.add(
+            self.answer.author_id,
+            rating=-VOTE_VALUES[self.type],
+            reputation=-VOTE_REPUTATION['answer'][self.type],
+        )
+        return result
+
+    def __str__(self):
+        return f"{self.author.username} liked {self.answer.content[:10]}..."
+
+class UserStatsManager(models.Manager):
+    COUNTERS = ['questions_count', 'answers_count', 'accepted_answers_count', 'rating', 'reputation']
+
+    def add(self, user_id, **deltas):
+        """Atomically add ``deltas`` to the user's counters."""
+        self.add_many({user_id: deltas})
+
+    def add_many(self, deltas_by_user):
+        """Apply per-user deltas, e.g. {user_id: {'rating': 2}}, in one upsert."""
+        rows = [
+            [user_id] + [deltas.get(field, 0) for field in self.COUNTERS]
+            for user_id, deltas in sorted(deltas_by_user.items())
+            if any(deltas.values())
+        ]
+        if not rows:
+            return
+        table = self.model._meta.db_table
+        placeholders = ', '.join(['(%s)' % ', '.join(['%s'] * len(rows[0]))] * len(rows))
+        increments = ', '.join(f'{field} = {table}.{field} + EXCLUDED.{field}' for field in self.COUNTERS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, {', '.join(self.COUNTERS)}) VALUES {placeholders} "
+                f"ON CONFLICT (user_id) DO UPDATE SET {increments}",
+                [value for row in rows for value in row],
             )
-        else:
-            Answer.objects.filter(pk=self.answer_id).update(
-                rating=models.F('rating') + 1
+        ReputationBucket.objects.add_many({
+            user_id: deltas['reputation']
+            for user_id, deltas in deltas_by_user.items() if deltas.get('reputation')
+        })
+
+    def top(self, limit):
+        return self.get_queryset().select_related('user__profile').order_by('-reputation', 'user_id')[:limit]
+
+
+class UserStats(models.Model):
+    """Per-user counters kept up to date by the write paths."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    questions_count = models.IntegerField(default=0)
+    answers_count = models.IntegerField(default=0)
+    accepted_answers_count = models.IntegerField(default=0)
+    rating = models.IntegerField(default=0)
+    reputation = models.IntegerField(default=0)
+
+    objects = UserStatsManager()
+
+    def __str__(self):
+        return f"Stats of {self.user_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-reputation', 'user'], name='userstats_reputation_idx'),
+        ]
+
+
+class ReputationBucketManager(models.Manager):
+    def add_many(self, points_by_user, week=None):
+        """Add reputation points to the users' buckets for ``week`` (default: current)."""
+        rows = [[user_id, points] for user_id, points in sorted(points_by_user.items()) if points]
+        if not rows:
+            return
+        week = week or current_week()
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, week, points) VALUES "
+                + ', '.join(['(%s, %s, %s)'] * len(rows))
+                + f" ON CONFLICT (week, user_id) DO UPDATE SET points = {table}.points + EXCLUDED.points",
+                [value for user_id, points in rows for value in (user_id, week, points)],
+            )
+
+    def top(self, limit, week=None):
+        return self.get_queryset().filter(week=week or current_week()).select_related(
+            'user__profile'
+        ).order_by('-points', 'user_id')[:limit]
+
+
+class ReputationBucket(models.Model):
+    """Reputation earned by a user during one calendar week (starting Monday)."""
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reputation_buckets', db_index=False)
+    week = models.DateField()
+    points = models.IntegerField(default=0)
+
+    objects = ReputationBucketManager()
+
+    def __str__(self):
+        return f"{self.user_id} {self.week}: {self.points}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['week', 'user'], name='reputation_bucket_week_user_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['week', '-points', 'user'], name='reputation_week_idx'),
+            models.Index(fields=['user'], name='reputation_user_idx'),
+        ]
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket of one rate-limited client; see app.ratelimit."""
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    # Deliberately unindexed besides the key, so refills are HOT updates.
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.1f}"
+
+
+class JobManager(models.Manager):
+    def enqueue(self, name, key=None, delay=0, **payload):
+        """Queue a background job in the current transaction.
+
+        Jobs sharing a ``key`` are deduplicated while pending, so enqueueing
+        the same work twice before a worker picks it up is a no-op.
+        """
+        job = Job(
+            name=name,
+            key=key,
+            payload=payload,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+        self.bulk_create([job], ignore_conflicts=True)
+
+    def pending(self):
+        return self.get_queryset().filter(
+            status=Job.PENDING, run_after__lte=timezone.now()
+        ).order_by('run_after', 'id')
+
+    def claim(self, limit, stale_after):
+        """Mark up to ``limit`` due jobs as running and return them.
+
+        Rows locked by another worker are skipped; jobs left running by a
+        crashed worker for longer than ``stale_after`` seconds are re-claimed.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            stale = self.get_queryset().select_for_update(skip_locked=True).filter(
+                status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=stale_after)
             )
-        super().delete(*args, **kwargs)
+            for job in stale:
+                job.retry_later('Worker lost while running the job')
+            ids = list(
+                self.pending().select_for_update(skip_locked=True).values_list('id', flat=True)[:limit]
+            )
+            self.get_queryset().filter(id__in=ids).update(status=Job.RUNNING, locked_at=now)
+        return list(self.get_queryset().filter(id__in=ids).order_by('run_after', 'id'))
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=255)
+    key = models.CharField(max_length=255, null=True, blank=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10,
+        choices=[(PENDING, PENDING), (RUNNING, RUNNING), (FAILED, FAILED)],
+        default=PENDING,
+    )
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    last_error = models.TextField(blank=True, default='')
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = JobManager()
 
     def __str__(self):
-        return f"{self.author.username} liked {self.answer.content[:10]}..."
\ No newline at end of file
+        return f"{self.name} ({self.status})"
+
+    def retry_later(self, error):
+        self.attempts += 1
+        self.last_error = error
+        if self.attempts >= self.max_attempts:
+            self.status = Job.FAILED
+        else:
+            self.status = Job.PENDING
+            self.run_after = timezone.now() + timedelta(seconds=min(2 ** self.attempts, 3600))
+        try:
+            with transaction.atomic():
+                self.save(update_fields=['attempts', 'last_error', 'status', 'run_after'])
+        except IntegrityError:
+            # The same work was enqueued again meanwhile; let that job do it.
+            self.delete()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['run_after', 'id'],
+                name='job_pending_idx',
+                condition=Q(status='pending'),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                name='job_pending_key_uniq',
+                condition=Q(status='pending'),
+            ),
+        ]
@@ -0,0 +1,348 @@
+"""Two-level cache of hot model instances.
+
+Each worker keeps a small LRU of pickled instances (bounded by entries and
+bytes, with a short TTL). With OBJECT_CACHE['SHARED'] it sits in front of
+the shared cache (settings.CACHES); the settings turn it on with Redis
+only, since a lookup in the PostgreSQL cache table costs as many queries
+as loading the object. Shared entries are keyed by a per-object version
+that is bumped when a transaction changing the object commits: readers
+that loaded the old row before the commit store it under the old version,
+where nobody looks any more. Other workers may serve their local copy for
+up to LOCAL_TTL seconds after a change.
+
+A miss is loaded once per worker: its threads wait on a lock per key
+(SingleFlight). Workers do not wait for each other here, a lock in the
+shared cache costs more than loading one object.
+
+Expensive values shared by all pages (the sidebar, the first feed pages)
+go through compute_once() instead, which keeps all workers from
+recomputing them at the same moment: one caller computes while the others
+wait for it (cold) or serve the previous value (expired), and values are
+recomputed early with growing probability as they approach expiry (XFetch).
+
+Hit and miss counters are kept per worker and added to counters in the
+shared cache every STATS_INTERVAL seconds; ``manage.py cache_stats`` shows
+the totals of all workers.
+"""
+import hashlib
+import math
+import pickle
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import transaction
+
+from app.models import Profile, Question, Tag
+
+LOCAL_TTL = 5
+LOCAL_MAX_ENTRIES = 5000
+LOCAL_MAX_BYTES = 16 * 1024 * 1024
+SHARED = False
+SHARED_TTL = 300
+# A worker loading a key holds its shared lock at most this long; the others poll meanwhile.
+LOCK_TIMEOUT = 5
+POLL_INTERVAL = 0.02
+STATS_INTERVAL = 10
+
+COUNTERS = ['local_hits', 'shared_hits', 'misses', 'evictions']
+MISSING = object()
+CACHES = {}
+
+
+def option(name, default):
+    """OBJECT_CACHE = {'LOCAL_TTL': 5, ...} in settings overrides the defaults above."""
+    return getattr(settings, 'OBJECT_CACHE', {}).get(name, default)
+
+
+class LRU:
+    """Thread-safe LRU of byte strings, bounded by entry count and total size, with a TTL."""
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires at, data)
+        self.size = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires <= time.monotonic():
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            self.remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, data)
+            self.size += len(data)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.remove(key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class SingleFlight:
+    """Let one caller per key compute a missing value while the others wait for it."""
+
+    def __init__(self):
+        self.guard = threading.Lock()
+        self.locks = {}  # key -> [lock, callers]
+
+    def run(self, key, compute, lookup, shared=False):
+        """Return ``compute()`` run by one caller, or ``lookup()`` for callers that waited.
+
+        ``lookup`` returns MISSING when there is no value; ``compute`` is
+        expected to store its result where ``lookup`` finds it. With
+        ``shared`` other workers wait too, on a lock in the shared cache.
+        """
+        with self.guard:
+            entry = self.locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            lock = entry[0]
+            if not lock.acquire(blocking=False):
+                lock.acquire()
+                # Another thread computed it meanwhile.
+                value = lookup()
+                if value is not MISSING:
+                    lock.release()
+                    return value
+            try:
+                return self.run_shared(key, compute, lookup) if shared else compute()
+            finally:
+                lock.release()
+        finally:
+            with self.guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.locks[key]
+
+    def run_shared(self, key, compute, lookup):
+        lock = f'{key}:lock'
+        if cache.add(lock, 1, LOCK_TIMEOUT):
+            try:
+                return compute()
+            finally:
+                cache.delete(lock)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = lookup()
+            if value is not MISSING:
+                return value
+            if cache.get(lock) is None:
+                break
+        # Nothing was stored (not found, or the loading worker died): compute it here.
+        return compute()
+
+
+single_flight = SingleFlight()
+
+
+def compute_once(key, compute, ttl, stale_ttl=None, beta=1.0):
+    """Return the cached result of ``compute()``, recomputing it in one caller at a time.
+
+    A value is fresh for ``ttl`` seconds and then served stale for up to
+    ``stale_ttl`` more (default: ``ttl``) while one caller recomputes it.
+    Before expiry each caller recomputes early with probability growing as
+    expiry nears, scaled by how long the last computation took and ``beta``
+    (XFetch), so a busy key is usually refreshed before anyone sees it
+    expire. Only when there is no value at all do callers wait.
+    """
+    key = f'computed:{key}'
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+
+    def recompute():
+        started = time.monotonic()
+        value = compute()
+        took = time.monotonic() - started
+        cache.set(key, (value, took, time.time() + ttl), ttl + stale_ttl)
+        return value
+
+    entry = cache.get(key)
+    if entry is None:
+        return single_flight.run(key, recompute, lambda: cache.get(key, (MISSING,))[0], shared=True)
+
+    value, took, expires = entry
+    # -log(U) for U uniform in (0, 1] is exponentially distributed with mean 1.
+    if time.time() - took * beta * math.log(1 - random.random()) < expires:
+        return value
+    lock = f'{key}:lock'
+    if not cache.add(lock, 1, LOCK_TIMEOUT):
+        return value  # someone else is recomputing
+    try:
+        return recompute()
+    finally:
+        cache.delete(lock)
+
+
+class ObjectCache:
+    """Cache of ``load(key)`` results; ``None`` (not found) is not cached."""
+
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+        self.local = LRU(
+            option('LOCAL_MAX_ENTRIES', LOCAL_MAX_ENTRIES),
+            option('LOCAL_MAX_BYTES', LOCAL_MAX_BYTES),
+            option('LOCAL_TTL', LOCAL_TTL),
+        )
+        self.counts = Counter()
+        self.flushed_at = time.monotonic()
+        CACHES[name] = self
+
+    def base_key(self, key):
+        key = str(key)
+        # Keys from URLs (tag names) may be long or contain spaces, which some backends reject.
+        if len(key) > 100 or not key.isprintable() or ' ' in key:
+            key = hashlib.sha1(key.encode()).hexdigest()
+        return f'objects:{self.name}:{key}'
+
+    @property
+    def shared(self):
+        return option('SHARED', SHARED)
+
+    def version_key(self, key):
+        return f'{self.base_key(key)}:version'
+
+    def shared_key(self, key):
+        """The key of the current version of ``key`` in the shared cache.
+
+        Objects never changed have version 0. Should the shared cache evict
+        a version, its object falls back to an entry of version 0, stale
+        for at most SHARED_TTL.
+        """
+        return f'{self.base_key(key)}:{cache.get(self.version_key(key), 0)}'
+
+    def get(self, key):
+        data = self.local.get(key)
+        if data is not None:
+            self.counts['local_hits'] += 1
+            return pickle.loads(data)
+
+        if self.shared:
+            shared_key = self.shared_key(key)
+            data = cache.get(shared_key)
+        else:
+            shared_key = None
+        if data is not None:
+            self.counts['shared_hits'] += 1
+        else:
+            self.counts['misses'] += 1
+            data = single_flight.run(
+                shared_key or self.base_key(key),
+                lambda: self.fill(key, shared_key),
+                lambda: self.local.get(key) or (cache.get(shared_key, MISSING) if shared_key else MISSING),
+            )
+        if data is None:
+            return None
+        self.local.set(key, data)
+        # Every caller gets its own copy to annotate (has_voted and the like).
+        return pickle.loads(data)
+
+    def fill(self, key, shared_key):
+        obj = self.load(key)
+        if obj is None:
+            return None
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        if shared_key:
+            cache.set(shared_key, data, option('SHARED_TTL', SHARED_TTL))
+        else:
+            # Threads waiting for the key look for it in the local cache only.
+            self.local.set(key, data)
+        return data
+
+    def invalidate(self, *keys):
+        """Drop ``keys`` once the current transaction commits."""
+        transaction.on_commit(lambda: self.invalidate_now(keys))
+
+    def invalidate_now(self, keys):
+        for key in keys:
+            self.local.delete(key)
+            if self.shared:
+                cache.set(self.version_key(key), time.time_ns(), None)
+
+    def flush_counts(self):
+        """Add this worker's counters to the shared totals."""
+        counts = {**self.counts, 'evictions': self.local.evictions}
+        self.counts.clear()
+        self.local.evictions = 0
+        for counter, value in counts.items():
+            if not value:
+                continue
+            key = f'objects:{self.name}:stats:{counter}'
+            if not cache.add(key, value, None):
+                try:
+                    cache.incr(key, value)
+                except ValueError:
+                    cache.set(key, value, None)
+        self.flushed_at = time.monotonic()
+
+
+def stats():
+    """{cache name: {counter: total}} over all workers since the last reset."""
+    keys = {f'objects:{name}:stats:{counter}': (name, counter) for name in CACHES for counter in COUNTERS}
+    values = cache.get_many(list(keys))
+    totals = {name: dict.fromkeys(COUNTERS, 0) for name in CACHES}
+    for key, value in values.items():
+        name, counter = keys[key]
+        totals[name][counter] = value
+    return totals
+
+
+def reset_stats():
+    cache.delete_many([f'objects:{name}:stats:{counter}' for name in CACHES for counter in COUNTERS])
+
+
+def clear_local():
+    for object_cache in CACHES.values():
+        object_cache.local.clear()
+
+
+def flush_counts(**kwargs):
+    interval = option('STATS_INTERVAL', STATS_INTERVAL)
+    if interval is None:
+        return
+    for object_cache in CACHES.values():
+        if time.monotonic() - object_cache.flushed_at >= interval:
+            object_cache.flush_counts()
+
+
+request_finished.connect(flush_counts)
+
+
+# Without authors: profile edits would not show until the entry expires (views.attach_authors).
+questions = ObjectCache('question', lambda question_id: (
+    Question.objects.by_id(question_id).select_related('accepted_answer').first()
+))
+tags = ObjectCache('tag', lambda name: Tag.objects.filter(name=name).first())
+profiles = ObjectCache('profile', lambda profile_id: Profile.objects.by_id(profile_id).first())
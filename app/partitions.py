@@ -0,0 +1,133 @@
+"""Hash partitioning of the vote tables by their target.
+
+Votes are always read per target: the current user's vote on a question
+or on a page of answers, the votes replaced by a vote batch. Partitioning
+app_questionlike by question_id and app_answerlike by answer_id lets those
+lookups prune to the partitions of their targets, and every partition has
+its own smaller indexes and vacuum cycle.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary keys become (id, <target>_id). Questions and answers are not
+partitioned: other tables reference them by id alone, and the question
+page reads answers by question, not by age.
+"""
+import json
+
+from django.db import connection
+
+from app.models import Question, Answer, QuestionLike, AnswerLike
+
+DEFAULT_PARTITIONS = 8
+
+# Partitioned table -> partition key.
+PARTITIONED = {
+    QuestionLike._meta.db_table: 'question_id',
+    AnswerLike._meta.db_table: 'answer_id',
+}
+
+
+def rebuild(cursor, table, key, modulus=None):
+    """Recreate ``table`` hash-partitioned by ``key`` into ``modulus`` partitions.
+
+    With ``modulus=None`` the table becomes a plain one again. Rows,
+    constraints, indexes, triggers and the id sequence are carried over
+    under the same names. Runs in the caller's transaction; writes to the
+    table are blocked until it commits.
+    """
+    new = f'{table}__new'
+    # Pending deferred foreign key checks of earlier writes would block DROP TABLE.
+    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+    cursor.execute(
+        'SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint '
+        "WHERE conrelid = %s::regclass ORDER BY contype = 'p' DESC",
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        'SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN '
+        '(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)',
+        [table, table],
+    )
+    indexes = [definition for definition, in cursor.fetchall()]
+    cursor.execute(
+        'SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal',
+        [table],
+    )
+    triggers = [definition for definition, in cursor.fetchall()]
+
+    partition_by = f' PARTITION BY HASH ({key})' if modulus else ''
+    cursor.execute(f'CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS INCLUDING IDENTITY){partition_by}')
+    for remainder in range(modulus or 0):
+        cursor.execute(
+            f'CREATE TABLE {new}_p{remainder} PARTITION OF {new} '
+            f'FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})'
+        )
+    cursor.execute(f'INSERT INTO {new} SELECT * FROM {table}')
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{new}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {new}"
+    )
+
+    cursor.execute(f'DROP TABLE {table}')
+    cursor.execute(f'ALTER TABLE {new} RENAME TO {table}')
+    cursor.execute(f"SELECT pg_get_serial_sequence('{table}', 'id')")
+    cursor.execute(f'ALTER SEQUENCE {cursor.fetchone()[0]} RENAME TO {table}_id_seq')
+    for remainder in range(modulus or 0):
+        cursor.execute(f'ALTER TABLE {new}_p{remainder} RENAME TO {table}_p{remainder}')
+
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = f'PRIMARY KEY (id, {key})' if modulus else 'PRIMARY KEY (id)'
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+    for definition in indexes + triggers:
+        cursor.execute(definition)
+    cursor.execute(f'ANALYZE {table}')
+
+
+def partitions(table):
+    """[(partition, estimated rows, total bytes)] of ``table``, empty when not partitioned."""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname, GREATEST(c.reltuples, 0)::bigint, pg_total_relation_size(c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname
+        """, [table])
+        return cursor.fetchall()
+
+
+def scanned_partitions(queryset):
+    """Names of the vote-table partitions the plan of ``queryset`` reads."""
+    def walk(node):
+        if node.get('Relation Name', '').startswith(tuple(PARTITIONED)):
+            yield node['Relation Name']
+        for child in node.get('Plans', []):
+            yield from walk(child)
+
+    plan = json.loads(queryset.explain(format='json'))
+    return set(walk(plan[0]['Plan']))
+
+
+def page_queries():
+    """(name, queryset, targets) for the vote lookups of the feed and question pages."""
+    # Pruning happens at plan time, so any ids will do on an empty database.
+    question_ids = list(Question.objects.new().values_list('id', flat=True)[:5]) or [1]
+    answer_ids = list(Answer.objects.by_question(question_ids[0]).values_list('id', flat=True)[:5]) or [1]
+    user_id = 1
+    return [
+        # Question.has_liked / Answer.has_liked for a single item.
+        ('has_liked question', Question(id=question_ids[0]).likes.filter(id=user_id), question_ids[:1]),
+        ('has_liked answer', Answer(id=answer_ids[0]).likes.filter(id=user_id), answer_ids[:1]),
+        # views.mark_voted on a page of the feed or question page, and
+        # VoteBatchForm.apply_votes reading the previous votes of a batch.
+        ('page votes questions', QuestionLike.objects.filter(author_id=user_id, question_id__in=question_ids), question_ids),
+        ('page votes answers', AnswerLike.objects.filter(author_id=user_id, answer_id__in=answer_ids), answer_ids),
+    ]
+
+
+def verify():
+    """[(query, partitions scanned, targets)]; a pruned plan reads at most one partition per target."""
+    return [
+        (name, scanned_partitions(queryset), targets)
+        for name, queryset, targets in page_queries()
+    ]
@@ -0,0 +1,116 @@
+"""Token-bucket rate limiting shared by all workers.
+
+Buckets live in an unlogged PostgreSQL table and a single upsert per
+request refills and spends every bucket of the client. Rejected requests
+spend a token too (at most one token of debt), so clients that keep
+hammering stay throttled until they back off.
+
+Signed-in clients are limited per user, anonymous ones per IP address.
+Behind a reverse proxy the address is taken from X-Forwarded-For, but
+only for requests coming from settings.RATE_LIMIT_TRUSTED_PROXIES:
+otherwise every client would share the proxy's address.
+"""
+import math
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+
+from app.models import RateLimitBucket
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# Buckets idle this long are full again for every rate used here, so dropping them is harmless.
+PRUNE_AFTER = 86400
+
+
+def parse_rate(rate):
+    """'30/m' -> (30 tokens, 60 seconds)."""
+    count, unit = rate.split('/')
+    return int(count), UNITS[unit]
+
+
+def hit(keys, per_second, burst, cost=1):
+    """Spend ``cost`` tokens from each bucket; returns seconds to wait, 0 when allowed."""
+    table = RateLimitBucket._meta.db_table
+    refill = (
+        f'LEAST(%(burst)s, {table}.tokens'
+        f' + EXTRACT(EPOCH FROM clock_timestamp() - {table}.updated_at) * %(rate)s)'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {table} (key, tokens, updated_at)
+            SELECT key, GREATEST(%(burst)s - %(cost)s, -1), clock_timestamp() FROM unnest(%(keys)s::varchar[]) AS key
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = GREATEST({refill} - %(cost)s, -1),
+                updated_at = clock_timestamp()
+            RETURNING tokens
+        """, {'keys': list(keys), 'rate': per_second, 'burst': burst, 'cost': cost})
+        lowest = min(tokens for tokens, in cursor.fetchall())
+    if lowest >= 0:
+        return 0
+    # Allowed again once the bucket refills to ``cost`` whole tokens.
+    return math.ceil((cost - lowest) / per_second)
+
+
+def client_ip(request):
+    """The client address: the last one in X-Forwarded-For not added by a trusted proxy."""
+    trusted = getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', ())
+    address = request.META.get('REMOTE_ADDR', '')
+    forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    # Clients can send any X-Forwarded-For; each trusted proxy appends the address it saw.
+    while address in trusted and forwarded:
+        address = forwarded.pop()
+    return address
+
+
+def client_keys(request, scope):
+    if request.user.is_authenticated:
+        return [f'{scope}:user:{request.user.pk}']
+    return [f'{scope}:ip:{client_ip(request)}']
+
+
+def too_many_requests(request, retry_after):
+    message = 'Too many requests'
+    if request.content_type == 'application/json':
+        response = JsonResponse({'status': 'error', 'message': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(scope, rate, burst=None, methods=('POST',), cost=None):
+    """Throttle the view per user, or per client IP for anonymous requests.
+
+    ``rate`` is like '30/m'; ``burst`` defaults to its count. Both can be
+    overridden per scope with settings.RATE_LIMITS = {scope: (rate, burst)}.
+    ``cost(request)`` gives the tokens a request spends (default 1), at
+    most the burst so that no request is refused forever.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return view(request, *args, **kwargs)
+            scope_rate, scope_burst = getattr(settings, 'RATE_LIMITS', {}).get(scope, (rate, burst))
+            count, period = parse_rate(scope_rate)
+            scope_burst = scope_burst or count
+            tokens = min(cost(request), scope_burst) if cost else 1
+            retry_after = hit(client_keys(request, scope), count / period, scope_burst, tokens)
+            if retry_after:
+                return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def prune(older_than=PRUNE_AFTER):
+    """Delete buckets idle for ``older_than`` seconds; returns how many."""
+    table = RateLimitBucket._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE updated_at < clock_timestamp() - make_interval(secs => %s)",
+            [older_than],
+        )
+        return cursor.rowcount
@@ -0,0 +1,124 @@
+"""Related questions from shared tags and title terms.
+
+Every question becomes a sparse TF-IDF vector over its tags and title words
+(tags weigh more), and the nearest neighbours by cosine similarity are
+stored in RelatedQuestion. Similarities are computed a block of rows at a
+time; a block holds a score for every question sharing a feature with one
+of its rows, so blocks are cut by that count as well as by rows. Requires
+NumPy and SciPy, imported lazily by the rebuild_related job.
+"""
+import math
+import re
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+
+from app.models import Question, RelatedQuestion
+
+RELATED_COUNT = 5
+TAG_WEIGHT = 2.0
+MIN_SCORE = 0.1
+# Title words and tags found in more than these shares of questions say nothing.
+MAX_TERM_SHARE = 0.05
+MAX_TAG_SHARE = 0.25
+CHUNK_SIZE = 2000
+# Scores computed per block of rows at most (but at least one row), about 12 bytes each.
+MAX_CHUNK_PRODUCTS = 20_000_000
+BATCH_SIZE = 1000
+
+WORD = re.compile(r'\w{3,}')
+
+
+def load_documents():
+    """Return (question ids, [[feature, ...] per question])."""
+    ids = []
+    features = []
+    for question_id, title in Question.objects.order_by('id').values_list('id', 'title').iterator():
+        ids.append(question_id)
+        features.append({f'w:{word}' for word in WORD.findall(title.lower())})
+    position = {question_id: i for i, question_id in enumerate(ids)}
+    tags = Question.tags.through.objects.values_list('question_id', 'tag_id').iterator()
+    for question_id, tag_id in tags:
+        if question_id in position:
+            features[position[question_id]].add(f't:{tag_id}')
+    return ids, [sorted(document) for document in features]
+
+
+def vectorize(documents):
+    """L2-normalized TF-IDF matrix (questions x features), tags weighted up."""
+    frequency = defaultdict(int)
+    for document in documents:
+        for feature in document:
+            frequency[feature] += 1
+    total = len(documents)
+    weights = {}
+    for feature, count in frequency.items():
+        is_tag = feature.startswith('t:')
+        if count < 2 or count > total * (MAX_TAG_SHARE if is_tag else MAX_TERM_SHARE):
+            continue
+        weights[feature] = math.log(total / count) * (TAG_WEIGHT if is_tag else 1.0)
+    columns = {feature: i for i, feature in enumerate(weights)}
+
+    rows, cols, values = [], [], []
+    for row, document in enumerate(documents):
+        for feature in document:
+            if feature in columns:
+                rows.append(row)
+                cols.append(columns[feature])
+                values.append(weights[feature])
+    matrix = sparse.csr_matrix((values, (rows, cols)), shape=(total, len(columns)), dtype=np.float32)
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+def chunks(products, max_rows=CHUNK_SIZE, max_products=MAX_CHUNK_PRODUCTS):
+    """Yield (start, end) row ranges of at most ``max_rows`` rows and ``max_products`` products, one row at least."""
+    start, total = 0, 0
+    for row, count in enumerate(products):
+        if row > start and (row - start >= max_rows or total + count > max_products):
+            yield start, row
+            start, total = row, 0
+        total += count
+    if start < len(products):
+        yield start, len(products)
+
+
+def nearest(matrix, count=RELATED_COUNT, min_score=MIN_SCORE, max_products=MAX_CHUNK_PRODUCTS):
+    """Yield (row, [(other row, score), ...] best first) for rows with neighbours."""
+    transposed = matrix.T.tocsc()
+    # A row has at most as many scores as the rows sharing each of its features add up to.
+    sharing = np.bincount(matrix.indices, minlength=matrix.shape[1])[matrix.indices]
+    cumulative = np.concatenate([[0], np.cumsum(sharing)])
+    products = cumulative[matrix.indptr[1:]] - cumulative[matrix.indptr[:-1]]
+    for start, stop in chunks(products, max_products=max_products):
+        scores = (matrix[start:stop] @ transposed).tocsr()
+        for offset in range(scores.shape[0]):
+            row = start + offset
+            begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+            others = scores.indices[begin:end]
+            values = scores.data[begin:end]
+            keep = (others != row) & (values >= min_score)
+            others, values = others[keep], values[keep]
+            # Best first, lower rows first among equal scores, so ties at the cut are stable.
+            order = np.lexsort((others, -values))[:count]
+            if len(order):
+                yield row, list(zip(others[order].tolist(), values[order].tolist()))
+
+
+def rebuild(count=RELATED_COUNT):
+    """Recompute related questions for all questions; returns rows stored."""
+    ids, documents = load_documents()
+    rows = []
+    if ids:
+        for row, neighbours in nearest(vectorize(documents), count):
+            rows.extend(
+                RelatedQuestion(question_id=ids[row], related_id=ids[other], rank=rank, score=score)
+                for rank, (other, score) in enumerate(neighbours)
+            )
+    with transaction.atomic():
+        RelatedQuestion.objects.all().delete()
+        RelatedQuestion.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
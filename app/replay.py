@@ -0,0 +1,184 @@
+"""Replay of recorded traffic against a running instance.
+
+A traffic log is NDJSON, one request per line in the order received:
+
+    {"timestamp": 1760000000.25, "method": "GET", "path": "/hot/?page=2", "status": 200}
+
+Gunicorn access logs in the default format are converted into it with
+parse_access_log(). They only have second resolution, so requests of one
+second are spread evenly across it.
+
+Requests are sent at their recorded offsets divided by ``speed`` (0: as
+fast as possible), by at most ``concurrency`` clients at a time. Only GET
+and HEAD requests are replayed, and not the server-sent event streams.
+Results are grouped by the route of app/urls.py that serves the path; the
+database queries per request come from the X-DB-Queries header that
+app.middleware.QueryCountMiddleware adds when ASKME_QUERY_COUNT=1.
+"""
+import json
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from django.urls import Resolver404, resolve
+
+REPLAYED_METHODS = {'GET', 'HEAD'}
+# Never-ending responses; a replay would wait on them until the timeout.
+STREAMING = {'question.events'}
+UNMATCHED = '<unmatched>'
+TIMEOUT = 30
+
+# %(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"
+ACCESS_LOG_LINE = re.compile(
+    r'\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3}) '
+)
+ACCESS_LOG_TIME = '%d/%b/%Y:%H:%M:%S %z'
+
+
+def parse_access_log(lines):
+    """Yield traffic log records for the request lines of a gunicorn access log."""
+    second, pending = None, []
+    for line in lines:
+        match = ACCESS_LOG_LINE.match(line)
+        if not match:
+            continue
+        timestamp = datetime.strptime(match['time'], ACCESS_LOG_TIME).timestamp()
+        if timestamp != second:
+            yield from spread(pending)
+            second, pending = timestamp, []
+        pending.append({
+            'timestamp': timestamp,
+            'method': match['method'],
+            'path': match['path'],
+            'status': int(match['status']),
+        })
+    yield from spread(pending)
+
+
+def spread(records):
+    for i, record in enumerate(records):
+        record['timestamp'] += i / len(records)
+        yield record
+
+
+def read_log(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def route(path):
+    """The app/urls.py route serving ``path``, e.g. '/question/<int:question_id>/', and its name."""
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return UNMATCHED, None
+    return '/' + match.route, match.url_name
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as they are instead of timing the redirected page too."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+@dataclass
+class Result:
+    route: str
+    status: int | None  # None: no response (connection error or timeout)
+    latency: float  # ms
+    queries: int | None
+    lag: float  # ms the request was sent after its scheduled time
+
+
+def send(opener, base_url, record):
+    request = urllib.request.Request(base_url + record['path'], method=record['method'])
+    started = time.perf_counter()
+    try:
+        with opener.open(request, timeout=TIMEOUT) as response:
+            response.read()
+            status, headers = response.status, response.headers
+    except urllib.error.HTTPError as error:
+        error.read()
+        status, headers = error.code, error.headers
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        status, headers = None, {}
+    latency = (time.perf_counter() - started) * 1000
+    queries = headers.get('X-DB-Queries')
+    return status, latency, int(queries) if queries is not None else None
+
+
+def replay(records, base_url, speed=1.0, concurrency=8, limit=None):
+    """Replay ``records``; returns ([Result], skipped requests)."""
+    base_url = base_url.rstrip('/')
+    opener = urllib.request.build_opener(NoRedirect)
+    results, skipped = [], 0
+    lock = threading.Lock()
+
+    def run(record, pattern, scheduled):
+        lag = max(time.perf_counter() - scheduled, 0) * 1000
+        status, latency, queries = send(opener, base_url, record)
+        with lock:
+            results.append(Result(pattern, status, latency, queries, lag))
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        started = first = None
+        submitted = 0
+        for record in records:
+            if submitted == limit:
+                break
+            pattern, name = route(record['path'])
+            if record['method'] not in REPLAYED_METHODS or name in STREAMING:
+                skipped += 1
+                continue
+            if first is None:
+                started, first = time.perf_counter(), record['timestamp']
+            scheduled = started + ((record['timestamp'] - first) / speed if speed else 0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, record, pattern, scheduled)
+            submitted += 1
+    return results, skipped
+
+
+def percentile(ordered, fraction):
+    return ordered[max(round(len(ordered) * fraction) - 1, 0)]
+
+
+def summarize(results):
+    """{route: stats} plus a 'total' entry, routes ordered by request count."""
+    groups = defaultdict(list)
+    for result in results:
+        groups[result.route].append(result)
+    groups = dict(sorted(groups.items(), key=lambda item: -len(item[1])))
+    groups['total'] = results
+
+    summary = {}
+    for pattern, group in groups.items():
+        if not group:
+            continue
+        latencies = sorted(result.latency for result in group)
+        counted = [result.queries for result in group if result.queries is not None]
+        summary[pattern] = {
+            'requests': len(group),
+            'errors': sum(result.status is None or result.status >= 500 for result in group),
+            'client_errors': sum(result.status is not None and 400 <= result.status < 500 for result in group),
+            'mean': statistics.mean(latencies),
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1],
+            'queries': sum(counted) if counted else None,
+            'lag_p95': percentile(sorted(result.lag for result in group), 0.95),
+        }
+    return summary
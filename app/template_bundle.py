@@ -0,0 +1,96 @@
+"""Precompiled template bundle with static includes inlined.
+
+Feed pages include layouts/question.html, rating.html and tag.html once per
+item, and every {% include %} looks the template up and renders it in a
+new context at request time. The bundle replaces
+
+    {% include 'layouts/rating.html' with rating=question.rating %}
+
+with the included source wrapped in {% with rating=question.rating %},
+which renders the same HTML. Includes with a variable name, ``only``, or a
+target that extends or defines blocks are left alone.
+
+Built at deploy time by ``manage.py bundle_templates`` into
+settings.TEMPLATE_BUNDLE_DIR. It shadows the source templates only with
+ASKME_TEMPLATE_BUNDLE=1 and only while it is fresh: the build records a
+hash of the source templates, and a bundle whose hash no longer matches
+is ignored at startup, so edited templates are never hidden by an old
+build.
+"""
+import hashlib
+import re
+import shutil
+from pathlib import Path
+
+INCLUDE = re.compile(r"""{%\s*include\s+(['"])(?P<name>[^'"]+)\1(?:\s+with\s+(?P<extra>.*?))?\s*%}""")
+NOT_INLINABLE = re.compile(r'{%\s*(extends|block)\b')
+MAX_DEPTH = 10
+SOURCE_HASH_FILE = '.source-hash'
+
+
+def inline_includes(source, read, depth=0):
+    """Return (source with static includes inlined, number inlined).
+
+    ``read(name)`` returns the source of a template, or None when it is not
+    part of the bundle (templates from installed apps).
+    """
+    inlined = 0
+
+    def replace(match):
+        nonlocal inlined
+        extra = match.group('extra')
+        if extra is not None and re.search(r'\bonly$', extra):
+            return match.group(0)
+        included = read(match.group('name'))
+        if included is None or NOT_INLINABLE.search(included) or depth >= MAX_DEPTH:
+            return match.group(0)
+        body, count = inline_includes(included, read, depth + 1)
+        inlined += count + 1
+        if extra:
+            return f'{{% with {extra} %}}{body}{{% endwith %}}'
+        return body
+
+    return INCLUDE.sub(replace, source), inlined
+
+
+def build(source_dir, target_dir):
+    """Write every template of ``source_dir`` into ``target_dir`` with includes inlined.
+
+    Anything left in ``target_dir`` from an earlier build is removed first.
+    Returns (templates written, includes inlined).
+    """
+    source_dir, target_dir = Path(source_dir), Path(target_dir)
+    if target_dir.exists():
+        shutil.rmtree(target_dir)
+
+    def read(name):
+        path = source_dir / name
+        return path.read_text() if path.is_file() else None
+
+    written = inlined = 0
+    for path in sorted(source_dir.rglob('*.html')):
+        body, count = inline_includes(path.read_text(), read)
+        target = target_dir / path.relative_to(source_dir)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(body)
+        written += 1
+        inlined += count
+    target_dir.mkdir(parents=True, exist_ok=True)
+    (target_dir / SOURCE_HASH_FILE).write_text(source_hash(source_dir))
+    return written, inlined
+
+
+def source_hash(source_dir):
+    """Hash of the names and contents of every template in ``source_dir``."""
+    source_dir = Path(source_dir)
+    digest = hashlib.sha256()
+    for path in sorted(source_dir.rglob('*.html')):
+        digest.update(str(path.relative_to(source_dir)).encode() + b'\0')
+        digest.update(path.read_bytes() + b'\0')
+    return digest.hexdigest()
+
+
+def is_fresh(source_dir, target_dir):
+    """Whether ``target_dir`` holds a bundle built from the current ``source_dir``."""
+    recorded = Path(target_dir) / SOURCE_HASH_FILE
+    return recorded.is_file() and recorded.read_text() == source_hash(source_dir)
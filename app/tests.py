@@ -1,3 +1,1185 @@
-from django.test import TestCase
+import asyncio
+import difflib
+import html
+import importlib.util
+import json
+import os
+import re
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django import forms
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.test import LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+
+from app import api, counters, duplicates, events, jobs, objectcache, partitions, ratelimit, related, replay, template_bundle, transfer, urls, views
+from app.forms import AnswerApproveForm
+from app.models import Question, Answer, Tag, Profile, QuestionLike, AnswerLike, Job, UserStats, ReputationBucket
+from app.models import QuestionBucket, QuestionSignature, RelatedQuestion
+
+
+def seed(users=20, tags=10, questions=100, answers_per_question=5):
+    """Create a small deterministic dataset and refresh planner statistics."""
+    now = timezone.now()
+    users = User.objects.bulk_create([
+        User(username=f'user{i}', email=f'user{i}@example.com', password='password123')
+        for i in range(users)
+    ])
+    Profile.objects.bulk_create([Profile(user=user, nickname=user.username) for user in users])
+    tags = Tag.objects.bulk_create([Tag(name=f'tag{i}') for i in range(tags)])
+
+    questions = Question.objects.bulk_create([
+        Question(
+            title=f'Question {i}',
+            content=f'Content of question {i}',
+            author=users[i % len(users)],
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(questions)
+    ])
+    Question.tags.through.objects.bulk_create([
+        Question.tags.through(question_id=question.id, tag_id=tags[(i + shift) % len(tags)].id)
+        for i, question in enumerate(questions)
+        for shift in range(2)
+    ])
+
+    answers = Answer.objects.bulk_create([
+        Answer(
+            content=f'Answer {j} to question {i}',
+            question=question,
+            author=users[(i + j) % len(users)],
+            created_at=question.created_at + timedelta(seconds=j),
+            is_correct=j == 0,
+        )
+        for i, question in enumerate(questions)
+        for j in range(answers_per_question)
+    ])
+
+    Question.objects.update(accepted_answer=Subquery(
+        Answer.objects.filter(question=OuterRef('pk'), is_correct=True).values('id')[:1]
+    ))
+
+    QuestionLike.objects.bulk_create([
+        QuestionLike(question=question, author=users[(i + k) % len(users)], type='like')
+        for i, question in enumerate(questions)
+        for k in range(i % 4)
+    ])
+    AnswerLike.objects.bulk_create([
+        AnswerLike(answer=answer, author=users[i % len(users)], type='dislike')
+        for i, answer in enumerate(answers)
+    ])
+
+    counters.recount()
+    ReputationBucket.objects.add_many({user.id: i for i, user in enumerate(users)})
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return users, tags, questions, answers
+
+
+class QueryPlanTests(TestCase):
+    """Every hot access path must be served by an index, in index order.
+
+    The dataset is tiny, so sequential scans and sorts are disabled for the
+    planner: if one still shows up, no index can serve the query.
+    """
+
+    SORT_NODE = re.compile(r'(^|->\s+)(Incremental )?Sort\b', re.MULTILINE)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, cls.questions, cls.answers = seed()
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute('SET LOCAL enable_incremental_sort = off')
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+        self.assertIsNone(self.SORT_NODE.search(plan), plan)
+
+    def test_new_questions(self):
+        self.assertIndexed(Question.objects.new()[:5])
+
+    def test_hot_questions(self):
+        self.assertIndexed(Question.objects.hot()[:5])
+
+    def test_questions_by_tag(self):
+        self.assertIndexed(Question.objects.by_tag(self.tags[0].name)[:5])
+
+    def test_question_by_id(self):
+        self.assertIndexed(Question.objects.by_id(self.questions[0].id))
+
+    def test_questions_by_author(self):
+        self.assertIndexed(Question.objects.by_author(self.users[0].id)[:10])
+
+    def test_related_questions(self):
+        self.assertIndexed(Question.objects.related(self.questions[0].id)[:5])
+
+    def test_answers_by_author(self):
+        self.assertIndexed(Answer.objects.by_author(self.users[0].id)[:10])
+
+    def test_user_stats(self):
+        self.assertIndexed(UserStats.objects.filter(user_id=self.users[0].id))
+
+    def test_top_profiles_by_reputation(self):
+        self.assertIndexed(Profile.objects.get_top_profiles_by_reputation())
+
+    def test_top_users_all_time(self):
+        self.assertIndexed(UserStats.objects.top(50))
+
+    def test_top_users_this_week(self):
+        self.assertIndexed(ReputationBucket.objects.top(50))
+
+    def test_top_tags(self):
+        self.assertIndexed(Tag.objects.top_tags_by_questions_count())
+
+    def test_tag_suggestions(self):
+        # The prefix match is served by the index; only the few matches are sorted.
+        plan = Tag.objects.suggest('tag1', 10).explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+        self.assertIn('tag_name_prefix_idx', plan, plan)
+
+    def test_duplicate_candidates(self):
+        duplicates.index_missing()
+        keys = duplicates.buckets(duplicates.signatures('Question 1', '')[0], duplicates.TITLE)
+        # Only the few candidates found are grouped and sorted by matching buckets.
+        plan = QuestionBucket.objects.filter(bucket__in=keys).values('question_id').explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+        self.assertIn('Index Only Scan using question_bucket_idx', plan, plan)
+
+    def test_answers_by_question(self):
+        self.assertIndexed(Answer.objects.by_question(self.questions[0].id)[:5])
+
+    def test_correct_answers_by_question(self):
+        self.assertIndexed(Answer.objects.correct().filter(question_id=self.questions[0].id))
+
+    def test_answer_location(self):
+        answer_id = self.answers[3].id
+        self.assertIndexed(Answer.objects.with_position().filter(id=answer_id))
+        self.assertEqual(Answer.objects.location(answer_id), (self.answers[3].question_id, 3))
+
+    def test_old_answers(self):
+        self.assertIndexed(Answer.objects.old()[:5])
+
+    def test_question_like_by_author_and_question(self):
+        question = self.questions[0]
+        self.assertIndexed(question.likes.filter(id=self.users[0].id))
+        self.assertIndexed(QuestionLike.objects.filter(author=self.users[0], question=question))
+
+    def test_answer_like_by_author_and_answer(self):
+        answer = self.answers[0]
+        self.assertIndexed(answer.likes.filter(id=self.users[0].id))
+        self.assertIndexed(AnswerLike.objects.filter(author=self.users[0], answer=answer))
+
+    def test_likes_by_author(self):
+        self.assertIndexed(QuestionLike.objects.filter(author=self.users[0]).order_by('question'))
+        self.assertIndexed(AnswerLike.objects.filter(author=self.users[0]).order_by('answer'))
+
+    def test_pending_jobs(self):
+        self.assertIndexed(Job.objects.pending()[:10])
+
+
+class QueryBudgetTests(TestCase):
+    """SQL queries and rows fetched per request of every URL, anonymous and signed in.
+
+    Budgets are for the seeded dataset and do not grow with the page: a
+    query per question or answer on a page of five breaks them. Queries,
+    rows and response times are written as JSON to the file named by
+    ASKME_QUERY_BUDGET_REPORT, when set.
+
+    Requests run against the configured cache backend, whose reads count
+    as queries with the PostgreSQL cache table. The sidebar and the first
+    feed pages are computed before (once per TTL for all workers, see
+    objectcache.compute_once), the object caches start empty.
+    """
+
+    REPORT = os.environ.get('ASKME_QUERY_BUDGET_REPORT')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.report = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, cls.questions, cls.answers = seed()
+        Profile.objects.update(avatar='avatars/test.png')
+        duplicates.index_missing()
+
+    def setUp(self):
+        cache.clear()
+        self.client.get('/')
+        self.client.get('/hot/')
+        objectcache.clear_local()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.REPORT and cls.report:
+            report = Path(cls.REPORT)
+            report.parent.mkdir(parents=True, exist_ok=True)
+            report.write_text(json.dumps(cls.report, indent=2))
+
+    def requests(self):
+        """(method, path, body, anonymous (queries, rows), signed in (queries, rows)).
+
+        The user signing in is the author of the first question and has
+        not voted on the questions and answers voted on here.
+        """
+        question, answer = self.questions[0], self.answers[1]
+        profile = self.users[0].profile
+        return [
+            ('get', '/', None, (5, 30), (9, 35)),
+            ('get', '/?page=3', None, (5, 30), (9, 35)),
+            ('get', '/hot/', None, (5, 30), (9, 35)),
+            ('get', f'/question/{question.id}/', None, (7, 25), (11, 30)),
+            ('get', f'/question/{question.id}/?page=2', None, (7, 25), (11, 30)),
+            ('get', f'/question/{question.id}/events/', None, (0, 0), (0, 0)),
+            ('get', f'/answer/{answer.id}/', None, (1, 1), (1, 1)),
+            ('get', '/ask/', None, (0, 0), (5, 15)),
+            ('get', f'/tag/{self.tags[1].name}/', None, (6, 30), (9, 35)),
+            ('get', '/search/?q=question', None, (5, 30), (9, 35)),
+            ('get', '/login/', None, (2, 10), (2, 2)),
+            ('get', '/signup/', None, (2, 10), (5, 15)),
+            ('get', '/profile/edit/', None, (0, 0), (5, 15)),
+            ('get', f'/profile/{profile.id}/', None, (6, 30), (9, 35)),
+            ('get', '/users/top/', None, (3, 30), (6, 35)),
+            ('get', '/users/top/?window=week', None, (3, 30), (6, 35)),
+            ('post', '/like_question/', {'questionId': self.questions[5].id, 'type': 'like'}, (0, 0), (11, 10)),
+            ('post', '/like_answer/', {'answerId': self.answers[7].id, 'type': 'like'}, (0, 0), (10, 10)),
+            ('post', '/like_batch/', [
+                {'target': 'question', 'id': self.questions[6].id, 'type': 'like'},
+                {'target': 'answer', 'id': self.answers[8].id, 'type': 'dislike'},
+            ], (0, 0), (18, 10)),
+            ('post', '/approve_answer/', {'answerId': answer.id, 'questionId': question.id}, (0, 0), (10, 10)),
+            ('get', '/api/v1/questions/?limit=20', None, (2, 65), (2, 65)),
+            ('get', f'/api/v1/questions/{question.id}/answers/', None, (1, 5), (1, 5)),
+            ('get', '/api/v1/tags/suggest/?prefix=tag', None, (1, 10), (1, 10)),
+            ('get', '/api/v1/questions/similar/?title=Question+1', None, (1, 60), (1, 60)),
+            ('get', '/logout/', None, (0, 0), (4, 3)),
+        ]
+
+    def measure(self, client, method, path, body):
+        """Status, SQL statements, rows returned and milliseconds of one request."""
+        statements, rows = [], 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal rows
+            result = execute(sql, params, many, context)
+            statements.append(sql)
+            if context['cursor'].description is not None:
+                rows += max(context['cursor'].rowcount, 0)
+            return result
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            if method == 'post':
+                response = client.post(path, json.dumps(body), content_type='application/json')
+            else:
+                response = client.get(path)
+            elapsed = (time.perf_counter() - started) * 1000
+        return response.status_code, statements, rows, elapsed
+
+    def check_budgets(self, user):
+        signed_in = user is not None
+        for method, path, body, *budgets in self.requests():
+            with self.subTest(path=path, signed_in=signed_in):
+                client = self.client_class()
+                if signed_in:
+                    client.force_login(user)
+                status, statements, rows, elapsed = self.measure(client, method, path, body)
+                self.report[f"{method.upper()} {path} ({'signed in' if signed_in else 'anonymous'})"] = {
+                    'status': status, 'queries': len(statements), 'rows': rows, 'ms': round(elapsed, 2),
+                }
+                self.assertLess(status, 500)
+                max_queries, max_rows = budgets[signed_in]
+                self.assertLessEqual(len(statements), max_queries, '\n'.join(statements))
+                self.assertLessEqual(rows, max_rows)
+
+    def test_anonymous(self):
+        self.check_budgets(None)
+
+    def test_signed_in(self):
+        self.check_budgets(self.users[0])
+
+    def test_every_url_has_a_budget(self):
+        covered = {resolve(path.split('?')[0]).url_name for _, path, *_ in self.requests()}
+        self.assertEqual({pattern.name for pattern in urls.urlpatterns} - covered, set())
+
+
+class JobQueueTests(TransactionTestCase):
+    """Claims lock rows against other workers' connections, so the jobs must be committed."""
+
+    def job(self, name='noop', **fields):
+        Job.objects.enqueue(name)
+        job = Job.objects.latest('id')
+        Job.objects.filter(id=job.id).update(**fields)
+        job.refresh_from_db()
+        return job
+
+    def test_pending_jobs_are_deduplicated_by_key(self):
+        Job.objects.enqueue('resize_avatar', key='resize_avatar:1', profile_id=1)
+        Job.objects.enqueue('resize_avatar', key='resize_avatar:1', profile_id=1)
+        Job.objects.enqueue('resize_avatar', key='resize_avatar:2', profile_id=2)
+        self.assertEqual(Job.objects.count(), 2)
+
+        # Once running, the same work may be queued again: the running job may have read stale data.
+        Job.objects.filter(key='resize_avatar:1').update(status=Job.RUNNING)
+        Job.objects.enqueue('resize_avatar', key='resize_avatar:1', profile_id=1)
+        self.assertEqual(Job.objects.filter(key='resize_avatar:1').count(), 2)
+
+    def test_claim_skips_jobs_locked_by_another_worker(self):
+        locked, free = self.job(), self.job()
+        self.job(run_after=timezone.now() + timedelta(hours=1))
+        holding, release = threading.Event(), threading.Event()
+
+        def other_worker():
+            try:
+                with transaction.atomic():
+                    list(Job.objects.select_for_update().filter(id=locked.id))
+                    holding.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        try:
+            self.assertTrue(holding.wait(10))
+            claimed = Job.objects.claim(10, stale_after=600)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual([job.id for job in claimed], [free.id])
+        self.assertEqual(Job.objects.get(id=free.id).status, Job.RUNNING)
+        self.assertEqual([job.id for job in Job.objects.claim(10, stale_after=600)], [locked.id])
+
+    def test_stale_running_jobs_are_retried(self):
+        lost = self.job(status=Job.RUNNING, locked_at=timezone.now() - timedelta(minutes=20))
+        recent = self.job(status=Job.RUNNING, locked_at=timezone.now())
+        self.assertEqual(Job.objects.claim(10, stale_after=600), [])
+
+        lost.refresh_from_db()
+        self.assertEqual((lost.status, lost.attempts), (Job.PENDING, 1))
+        self.assertIn('Worker lost', lost.last_error)
+        self.assertGreater(lost.run_after, timezone.now())
+        self.assertEqual(Job.objects.get(id=recent.id).status, Job.RUNNING)
+
+        Job.objects.filter(id=lost.id).update(run_after=timezone.now())
+        self.assertEqual([job.id for job in Job.objects.claim(10, stale_after=600)], [lost.id])
+
+    def test_failing_jobs_back_off_then_fail(self):
+        def fail():
+            raise RuntimeError('boom')
+
+        job = self.job(name='fail', max_attempts=3)
+        with mock.patch.dict(jobs.HANDLERS, {'fail': fail}):
+            for attempt, backoff in [(1, 2), (2, 4)]:
+                self.assertFalse(jobs.run_job(job))
+                job.refresh_from_db()
+                self.assertEqual((job.status, job.attempts), (Job.PENDING, attempt))
+                self.assertIn('RuntimeError: boom', job.last_error)
+                self.assertAlmostEqual(
+                    (job.run_after - timezone.now()).total_seconds(), backoff, delta=1
+                )
+            self.assertFalse(jobs.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertEqual(Job.objects.claim(10, stale_after=600), [])
+
+    def test_periodic_jobs_are_rescheduled_after_failing_for_good(self):
+        def fail():
+            raise RuntimeError('boom')
+
+        jobs.schedule_periodic('rebuild_related')
+        job = Job.objects.get()
+        Job.objects.filter(id=job.id).update(max_attempts=2)
+        job.refresh_from_db()
+        with mock.patch.dict(jobs.HANDLERS, {'rebuild_related': fail}):
+            self.assertFalse(jobs.run_job(job))
+            # Retrying: the pending job is the next run.
+            self.assertEqual(Job.objects.count(), 1)
+            self.assertFalse(jobs.run_job(job))
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.FAILED)
+        next_run = Job.objects.get(status=Job.PENDING)
+        self.assertEqual((next_run.name, next_run.key), ('rebuild_related', 'periodic:rebuild_related'))
+        self.assertAlmostEqual(
+            (next_run.run_after - timezone.now()).total_seconds(), jobs.PERIODIC['rebuild_related'], delta=5
+        )
+
+    def test_completed_jobs_are_deleted(self):
+        calls = []
+        job = self.job(name='record', payload={'value': 1})
+        with mock.patch.dict(jobs.HANDLERS, {'record': lambda value: calls.append(value)}):
+            self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.filter(id=job.id).exists())
+
+
+class EventTests(TransactionTestCase):
+    """NOTIFY is delivered on commit, so publishing is tested with committed transactions."""
+
+    def notifications(self, listener, timeout=5):
+        select.select([listener], [], [], timeout)
+        listener.poll()
+        messages = [json.loads(notify.payload) for notify in listener.notifies]
+        listener.notifies.clear()
+        return messages
+
+    def test_publish_notifies_on_commit(self):
+        listener = events.EventBroker.connect()
+        try:
+            with transaction.atomic():
+                events.publish(7, 'rating', target='question', id=7, rating=3)
+                self.assertEqual(self.notifications(listener, timeout=0.1), [])
+            self.assertEqual(self.notifications(listener), [
+                {'question': 7, 'event': 'rating', 'data': {'target': 'question', 'id': 7, 'rating': 3}},
+            ])
+        finally:
+            listener.close()
+
+    def test_broker_fans_out_per_question_and_drops_overflow(self):
+        broker = events.EventBroker(queue_size=2)
+        watching, also_watching, other = asyncio.Queue(2), asyncio.Queue(2), asyncio.Queue(2)
+        broker.subscribers[1].update([watching, also_watching])
+        broker.subscribers[2].add(other)
+        messages = [{'question': 1, 'event': 'rating', 'data': {'rating': rating}} for rating in range(3)]
+        broker.connection = SimpleNamespace(
+            poll=lambda: None,
+            notifies=[SimpleNamespace(payload=json.dumps(message)) for message in messages],
+        )
+        broker.dispatch()
+
+        for queue in (watching, also_watching):
+            self.assertEqual([queue.get_nowait() for _ in range(queue.qsize())], messages[:2])
+        self.assertTrue(other.empty())
+
+        # Closing a full queue makes room for the end-of-stream marker.
+        broker.put(watching, messages[0])
+        broker.put(watching, messages[1])
+        broker.close(watching)
+        self.assertEqual([watching.get_nowait() for _ in range(watching.qsize())], [messages[1], None])
+
+    def test_sync_workers_refuse_streams(self):
+        response = self.client.get('/question/1/events/')
+        self.assertEqual(response.status_code, 204)
+
+
+class VoteBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _, cls.questions, cls.answers = seed(questions=10)
+        cls.voter = User.objects.create_user('voter', password='password123')
+
+    def stats(self, user):
+        return UserStats.objects.filter(user=user).values_list('rating', 'reputation').first() or (0, 0)
+
+    def test_mixed_batch(self):
+        liked, new = self.questions[0], self.questions[1]
+        disliked, twice = self.answers[10], self.answers[15]  # first answers of questions 2 and 3
+        QuestionLike.objects.create(question=liked, author=self.voter, type='like')
+        AnswerLike.objects.create(answer=disliked, author=self.voter, type='dislike')
+        targets = [liked, new, disliked, twice]
+        for target in targets:
+            target.refresh_from_db(fields=['rating'])
+        ratings = [target.rating for target in targets]
+        authors = [target.author for target in targets]
+        self.assertEqual(len(set(authors)), 4)
+        stats = [self.stats(author) for author in authors]
+
+        self.client.force_login(self.voter)
+        response = self.client.post('/like_batch/', [
+            {'target': 'question', 'id': liked.id, 'type': 'dislike'},
+            {'target': 'question', 'id': new.id, 'type': 'like'},
+            {'target': 'answer', 'id': disliked.id, 'type': 'unvote'},
+            {'target': 'answer', 'id': twice.id, 'type': 'like'},
+            {'target': 'answer', 'id': twice.id, 'type': 'dislike'},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        rating_deltas = [-2, 1, 1, -1]
+        reputation_deltas = [-7, 5, 2, -2]
+        expected = [rating + delta for rating, delta in zip(ratings, rating_deltas)]
+        self.assertEqual(response.json()['ratings'], {
+            'question': {str(liked.id): expected[0], str(new.id): expected[1]},
+            'answer': {str(disliked.id): expected[2], str(twice.id): expected[3]},
+        })
+        for target, rating in zip(targets, expected):
+            target.refresh_from_db(fields=['rating'])
+            self.assertEqual(target.rating, rating)
+
+        self.assertEqual(
+            dict(QuestionLike.objects.filter(author=self.voter).values_list('question_id', 'type')),
+            {liked.id: 'dislike', new.id: 'like'},
+        )
+        self.assertEqual(
+            dict(AnswerLike.objects.filter(author=self.voter).values_list('answer_id', 'type')),
+            {twice.id: 'dislike'},
+        )
+        for author, (rating, reputation), rating_delta, reputation_delta in zip(
+            authors, stats, rating_deltas, reputation_deltas
+        ):
+            self.assertEqual(self.stats(author), (rating + rating_delta, reputation + reputation_delta))
+
+    def test_missing_target_changes_nothing(self):
+        self.client.force_login(self.voter)
+        response = self.client.post('/like_batch/', [
+            {'target': 'question', 'id': self.questions[0].id, 'type': 'like'},
+            {'target': 'answer', 'id': 0, 'type': 'like'},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(QuestionLike.objects.filter(author=self.voter).exists())
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, cls.questions, cls.answers = seed(questions=30)
+
+    def walk(self, path, **params):
+        """Ids of every page following ``next``, and the number of pages."""
+        ids, pages = [], 0
+        while True:
+            data = self.client.get(path, params).json()
+            ids.extend(row['id'] for row in data['results'])
+            pages += 1
+            if data['next'] is None:
+                return ids, pages
+            params['cursor'] = data['next']
+
+    def test_fields(self):
+        response = self.client.get('/api/v1/questions/', {'fields': 'id,title,tags', 'limit': 3})
+        for row in response.json()['results']:
+            self.assertEqual(set(row), {'id', 'title', 'tags'})
+            self.assertEqual(len(row['tags']), 2)
+        response = self.client.get(f'/api/v1/questions/{self.questions[0].id}/answers/', {'fields': 'id'})
+        self.assertEqual([set(row) for row in response.json()['results']], [{'id'}] * 5)
+        self.assertEqual(self.client.get('/api/v1/questions/', {'fields': 'id,secret'}).status_code, 400)
+
+    def test_cursors_visit_every_question_once(self):
+        for sort, ordering in api.QUESTION_ORDERINGS.items():
+            with self.subTest(sort=sort):
+                ids, pages = self.walk('/api/v1/questions/', sort=sort, limit=7, fields='id')
+                self.assertEqual(ids, list(Question.objects.order_by(*ordering).values_list('id', flat=True)))
+                self.assertEqual(pages, 5)
+
+        question = self.questions[0]
+        ids, _ = self.walk(f'/api/v1/questions/{question.id}/answers/', limit=2, fields='id')
+        self.assertEqual(ids, list(
+            Answer.objects.filter(question=question).order_by(*api.ANSWER_ORDERING).values_list('id', flat=True)
+        ))
+
+    def test_tag_filter(self):
+        tag = self.tags[1]
+        response = self.client.get('/api/v1/questions/', {'tag': tag.name, 'limit': 100, 'fields': 'id,tags'})
+        results = response.json()['results']
+        self.assertEqual(
+            {row['id'] for row in results},
+            set(Question.objects.filter(tags=tag).values_list('id', flat=True)),
+        )
+        self.assertTrue(all(tag.name in row['tags'] for row in results))
+
+    def test_etag(self):
+        response = self.client.get('/api/v1/questions/')
+        self.assertEqual(response.status_code, 200)
+        cached = self.client.get('/api/v1/questions/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(self.client.get('/api/v1/questions/', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_errors(self):
+        for params in [{'cursor': 'garbage'}, {'sort': 'oldest'}, {'limit': 'many'}]:
+            with self.subTest(params=params):
+                response = self.client.get('/api/v1/questions/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
+        question_id = self.questions[0].id
+        self.assertEqual(
+            self.client.get(f'/api/v1/questions/{question_id}/answers/', {'cursor': 'garbage'}).status_code, 400
+        )
+        self.assertEqual(self.client.get('/api/v1/questions/0/answers/').status_code, 404)
+
+
+class ProfilePageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, *_ = seed(users=4, questions=100)
+        Profile.objects.update(avatar='avatars/test.png')
+
+    def older_link(self, response, label):
+        match = re.search(rf'<a href="\?([^"]+)">{label}</a>', response.content.decode())
+        self.assertIsNotNone(match, label)
+        return parse_qs(html.unescape(match[1]))
+
+    def test_paging_one_list_keeps_the_other(self):
+        path = f'/profile/{self.users[0].profile.id}/'
+        query = self.older_link(self.client.get(path), 'Older questions')
+        self.assertEqual(set(query), {'questions'})
+
+        query = self.older_link(self.client.get(path, {'questions': query['questions'][0]}), 'Older answers')
+        self.assertEqual(set(query), {'questions', 'answers'})
+        response = self.client.get(path, {key: values[0] for key, values in query.items()})
+        self.assertEqual(set(self.older_link(response, 'Older questions')), {'questions', 'answers'})
+
+
+class RelatedQuestionTests(TestCase):
+    def test_rebuild_ranks_shared_tags_first(self):
+        # Question i is tagged tag<i % 10> and tag<(i + 1) % 10>; "Question" is in every title and ignored.
+        _, _, questions, _ = seed(questions=30)
+        self.assertEqual(related.rebuild(), 30 * related.RELATED_COUNT)
+
+        entries = RelatedQuestion.objects.filter(question=questions[0]).order_by('rank')
+        self.assertEqual([entry.rank for entry in entries], list(range(related.RELATED_COUNT)))
+        # Both tags shared, then one, lower ids first among equal scores.
+        self.assertEqual(
+            [entry.related_id for entry in entries],
+            [questions[i].id for i in (10, 20, 1, 9, 11)],
+        )
+        self.assertEqual([round(entry.score, 2) for entry in entries], [1.0, 1.0, 0.5, 0.5, 0.5])
+        self.assertEqual(
+            list(Question.objects.related(questions[0].id).values_list('id', flat=True)),
+            [entry.related_id for entry in entries],
+        )
+
+
+    def test_common_tags_are_ignored_and_blocks_bounded(self):
+        _, _, questions, _ = seed(questions=30)
+        common = Tag.objects.create(name='common')
+        Question.tags.through.objects.bulk_create([
+            Question.tags.through(question_id=question.id, tag_id=common.id) for question in questions
+        ])
+        related.rebuild()
+        self.assertEqual(
+            list(RelatedQuestion.objects.filter(question=questions[0]).order_by('rank').values_list('related_id', flat=True)),
+            [questions[i].id for i in (10, 20, 1, 9, 11)],
+        )
+
+        documents = related.load_documents()[1]
+        matrix = related.vectorize(documents)
+        without_common = [[feature for feature in document if feature != f't:{common.id}'] for document in documents]
+        self.assertEqual(matrix.nnz, related.vectorize(without_common).nnz)
+
+        self.assertEqual(list(related.chunks([3, 3, 3, 10, 1], max_rows=3, max_products=6)), [(0, 2), (2, 3), (3, 4), (4, 5)])
+        self.assertEqual(list(related.nearest(matrix, max_products=1)), list(related.nearest(matrix)))
+
+class CounterTests(TestCase):
+    """Triggers keep the counters exact for bulk and cascading writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, cls.questions, cls.answers = seed(users=5, tags=3, questions=10, answers_per_question=3)
+
+    def assertNoDrift(self):
+        self.assertEqual([rows for _, rows in counters.recount(dry_run=True)], [0] * (len(counters.COUNTERS) + 1))
+
+    def test_seeded_counters(self):
+        self.assertNoDrift()
+        question = Question.objects.get(id=self.questions[5].id)
+        self.assertEqual((question.answers_count, question.rating), (3, 1))
+        self.assertEqual(Tag.objects.get(id=self.tags[0].id).questions_count, 7)
+
+    def test_bulk_votes_and_cascades(self):
+        question = self.questions[0]
+        QuestionLike.objects.bulk_create([
+            QuestionLike(question=question, author=user, type='dislike') for user in self.users
+        ], update_conflicts=True, unique_fields=['question', 'author'], update_fields=['type'])
+        self.assertEqual(Question.objects.get(id=question.id).rating, -len(self.users))
+
+        Answer.objects.filter(question=self.questions[1]).delete()
+        self.assertEqual(Question.objects.get(id=self.questions[1].id).answers_count, 0)
+
+        Question.objects.filter(id=self.questions[2].id).delete()
+        self.assertEqual(Tag.objects.get(id=self.tags[2].id).questions_count, 5)
+
+    def test_recount_repairs_drift(self):
+        Question.objects.filter(id=self.questions[3].id).update(answers_count=100, rating=100)
+        UserStats.objects.filter(user=self.users[0]).delete()
+        drift = dict(counters.recount())
+        self.assertEqual((drift['question.answers_count'], drift['question.rating']), (1, 1))
+        self.assertEqual(drift['userstats.rows'], 1)
+        self.assertNoDrift()
+
+
+class AcceptedAnswerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, cls.questions, cls.answers = seed(users=5, tags=3, questions=2, answers_per_question=3)
+
+    def approve(self, answer, user):
+        form = AnswerApproveForm(data={'answerId': answer.id, 'questionId': answer.question_id}, user=user)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def test_toggle_moves_pointer_and_stats(self):
+        question, first, second = self.questions[0], self.answers[0], self.answers[1]
+        self.assertEqual(Question.objects.toggle_accepted(question.id, second.id, self.users[1].id), [])
+        self.assertEqual(Question.objects.toggle_accepted(self.questions[1].id, second.id, question.author_id), [])
+
+        self.assertTrue(self.approve(second, question.author))
+        self.assertEqual(Question.objects.get(id=question.id).accepted_answer_id, second.id)
+        self.assertEqual(list(Answer.objects.correct().filter(question=question).values_list('id', flat=True)), [second.id])
+
+        self.assertFalse(self.approve(second, question.author))
+        self.assertIsNone(Question.objects.get(id=question.id).accepted_answer_id)
+        self.assertFalse(Answer.objects.correct().filter(question=question).exists())
+        self.assertEqual(sum(rows for _, rows in counters.recount(dry_run=True)), 0)
+
+    def test_only_author_approves(self):
+        with self.assertRaisesMessage(forms.ValidationError, 'Only question author can approve answers'):
+            self.approve(self.answers[1], self.users[1])
+
+
+class RateLimitTests(TestCase):
+    def test_bucket_refills_and_throttles(self):
+        keys = ['test:ip:1', 'test:user:1']
+        self.assertEqual([ratelimit.hit(keys, 1 / 60, 2) for _ in range(2)], [0, 0])
+        self.assertEqual(ratelimit.hit(keys, 1 / 60, 2), 120)
+        self.assertEqual(ratelimit.hit(['test:ip:2'], 1 / 60, 2), 0)
+        self.assertEqual(ratelimit.hit(['test:ip:3'], 1 / 60, 5, cost=4), 0)
+        self.assertEqual(ratelimit.hit(['test:ip:3'], 1 / 60, 5, cost=4), 300)
+
+    @override_settings(RATE_LIMITS={'vote': ('1/m', 1)})
+    def test_users_behind_one_address_are_throttled_separately(self):
+        for name in ['first', 'second']:
+            self.client.force_login(User.objects.create_user(name, password='password123'))
+            response = self.client.post('/like_batch/', [], content_type='application/json', REMOTE_ADDR='127.0.0.1')
+            self.assertNotEqual(response.status_code, 429)
+
+    @override_settings(RATE_LIMIT_TRUSTED_PROXIES=['127.0.0.1'])
+    def test_client_ip_behind_trusted_proxy(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 10.0.0.1')
+        self.assertEqual(ratelimit.client_ip(request), '10.0.0.1')
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='10.0.0.1')
+        self.assertEqual(ratelimit.client_ip(request), '10.0.0.2')
+
+    @override_settings(RATE_LIMITS={'vote': ('3/m', 3)})
+    def test_throttled_view_returns_429(self):
+        user = User.objects.create_user('voter', password='password123')
+        self.client.force_login(user)
+        votes = [{'target': 'question', 'id': question_id, 'type': 'like'} for question_id in [1, 2]]
+        self.assertNotEqual(self.client.post('/like_batch/', votes, content_type='application/json').status_code, 429)
+        # One token left, the batch needs two.
+        response = self.client.post('/like_batch/', votes, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+
+class PartitionTests(TestCase):
+    def test_vote_lookups_prune_to_their_targets(self):
+        seed(questions=20)
+        for name, scanned, targets in partitions.verify():
+            self.assertLessEqual(len(scanned), len(set(targets)), name)
+
+    def test_repartition_keeps_rows_and_counters(self):
+        users, _, questions, _ = seed(questions=20)
+        votes = QuestionLike.objects.count()
+        with connection.cursor() as cursor:
+            partitions.rebuild(cursor, 'app_questionlike', 'question_id', 3)
+        self.assertEqual(len(partitions.partitions('app_questionlike')), 3)
+        self.assertEqual(QuestionLike.objects.count(), votes)
+        question = questions[0]
+        QuestionLike.objects.create(question=question, author=users[-1], type='like')
+        question.refresh_from_db(fields=['rating'])
+        self.assertEqual(question.rating, 1)
+        self.assertFalse([name for name, rows in counters.recount(['question'], dry_run=True) if rows])
+
+
+class DuplicateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _, cls.questions, _ = seed(questions=50)
+        Profile.objects.update(avatar='avatars/test.png')
+        cls.sort_question = Question.objects.create(
+            title='How to sort a list of dicts by value in Python',
+            content='I have a list of dictionaries and want to order it by the value of one key.',
+            author=cls.users[0],
+        )
+        duplicates.index_missing()
+
+    def test_finds_reworded_titles(self):
+        found = duplicates.find('How do I sort a list of dictionaries by a value in Python')
+        self.assertEqual([question['id'] for question in found], [self.sort_question.id])
+        self.assertEqual(duplicates.find('Django migrations fail on PostgreSQL'), [])
+
+    def test_finds_copied_content(self):
+        found = duplicates.find(
+            'Ordering records', 'Hi! I have a list of dictionaries and want to order it by the value of one key.'
+        )
+        self.assertEqual([question['id'] for question in found], [self.sort_question.id])
+
+    def test_ask_shows_duplicates_until_confirmed(self):
+        self.client.force_login(self.users[1])
+        draft = {'title': 'Sort a list of dicts by value in Python', 'text': 'How?', 'tags': ''}
+        response = self.client.post('/ask/', draft)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'/question/{self.sort_question.id}/')
+        self.assertFalse(Question.objects.filter(title=draft['title']).exists())
+
+        response = self.client.post('/ask/', {**draft, 'confirm_new': 'on'})
+        question = Question.objects.get(title=draft['title'])
+        self.assertRedirects(response, f'/question/{question.id}/', fetch_redirect_response=False)
+        self.assertIn(question.id, [found['id'] for found in duplicates.find(draft['title'])])
+
+    def test_similar_questions_api(self):
+        response = self.client.get('/api/v1/questions/similar/', {'title': 'sorting a list of dicts by value in python'})
+        self.assertEqual([question['id'] for question in response.json()['results']], [self.sort_question.id])
+        self.assertEqual(self.client.get('/api/v1/questions/similar/').status_code, 400)
+
+    def test_index_duplicates_command(self):
+        QuestionSignature.objects.filter(question__in=self.questions[:10]).delete()
+        call_command('index_duplicates', stdout=open(os.devnull, 'w'))
+        self.assertEqual(QuestionSignature.objects.count(), Question.objects.count())
+        call_command('index_duplicates', '--rebuild', stdout=open(os.devnull, 'w'))
+        self.assertEqual(QuestionSignature.objects.count(), Question.objects.count())
+        self.assertEqual(duplicates.find(self.questions[3].title)[0]['id'], self.questions[3].id)
+
+
+class TransferTests(TransactionTestCase):
+    """Workers use their own connections, so the data must be committed."""
+
+    def snapshot(self):
+        return (
+            list(Question.objects.order_by('id').values_list('id', 'title', 'rating', 'answers_count', 'accepted_answer_id')),
+            list(Answer.objects.order_by('id').values_list('id', 'question_id', 'rating', 'is_correct')),
+            list(AnswerLike.objects.order_by('id').values_list('id', 'answer_id', 'author_id', 'type')),
+            list(UserStats.objects.order_by('user_id').values_list()),
+        )
+
+    def test_dump_resume_and_load_round_trip(self):
+        seed(questions=20)
+        expected = self.snapshot()
+        with tempfile.TemporaryDirectory() as directory:
+            transfer.dump(directory, workers=2, rows_per_file=30)
+            # Interrupt the answers after their first file.
+            manifest = transfer.State(f'{directory}/manifest.json')
+            answers = manifest.table('app_answer')
+            for file in answers['files'][1:]:
+                os.remove(f"{directory}/{file['name']}")
+            answers['files'], answers['complete'] = answers['files'][:1], False
+            manifest.save()
+            self.assertEqual(transfer.dump(directory, workers=2, rows_per_file=30)['app_answer'], 70)
+
+            User.objects.all().delete()
+            Tag.objects.all().delete()
+            self.assertTrue(transfer.is_empty())
+            transfer.load(directory, workers=2)
+        self.assertEqual(self.snapshot(), expected)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ObjectCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        objectcache.clear_local()
+        objectcache.questions.counts.clear()
+
+    def test_lru_bounds(self):
+        lru = objectcache.LRU(max_entries=2, max_bytes=10, ttl=60)
+        lru.set('a', b'1234')
+        lru.set('b', b'1234')
+        lru.get('a')
+        lru.set('c', b'1234')
+        self.assertIsNone(lru.get('b'))
+        lru.set('d', b'12345678')
+        self.assertEqual([key for key in ['a', 'c', 'd'] if lru.get(key)], ['d'])
+        self.assertEqual((lru.size, lru.evictions), (8, 3))
+        lru.ttl = 0
+        lru.set('e', b'1')
+        self.assertIsNone(lru.get('e'))
+
+    @override_settings(OBJECT_CACHE={'SHARED': True})
+    def test_levels_copies_and_invalidation(self):
+        _, _, questions, _ = seed(questions=3)
+        question_id = questions[0].id
+        with self.assertNumQueries(2):  # question, tags
+            question = objectcache.questions.get(question_id)
+        question.has_voted = True
+        with self.assertNumQueries(0):
+            self.assertFalse(hasattr(objectcache.questions.get(question_id), 'has_voted'))
+        objectcache.clear_local()
+        with self.assertNumQueries(0):
+            self.assertEqual(objectcache.questions.get(question_id).title, questions[0].title)
+        self.assertEqual(
+            {key: objectcache.questions.counts[key] for key in ['local_hits', 'shared_hits', 'misses']},
+            {'local_hits': 1, 'shared_hits': 1, 'misses': 1},
+        )
+
+        Question.objects.filter(id=question_id).update(title='Changed')
+        with self.captureOnCommitCallbacks(execute=True):
+            objectcache.questions.invalidate(question_id)
+        self.assertEqual(objectcache.questions.get(question_id).title, 'Changed')
+        self.assertIsNone(objectcache.questions.get(0))
+
+    @override_settings(OBJECT_CACHE={'SHARED': False})
+    def test_local_only(self):
+        _, _, questions, _ = seed(questions=3)
+        question_id = questions[0].id
+        with self.assertNumQueries(2):
+            objectcache.questions.get(question_id)
+        with self.assertNumQueries(0):
+            objectcache.questions.get(question_id)
+        self.assertEqual(cache.get_many([
+            objectcache.questions.shared_key(question_id), objectcache.questions.version_key(question_id),
+        ]), {})
+
+        Question.objects.filter(id=question_id).update(title='Changed')
+        with self.captureOnCommitCallbacks(execute=True):
+            objectcache.questions.invalidate(question_id)
+        self.assertIsNone(cache.get(objectcache.questions.version_key(question_id)))
+        with self.assertNumQueries(2):
+            self.assertEqual(objectcache.questions.get(question_id).title, 'Changed')
+        self.assertEqual(
+            {key: objectcache.questions.counts[key] for key in ['local_hits', 'shared_hits', 'misses']},
+            {'local_hits': 1, 'shared_hits': 0, 'misses': 2},
+        )
+
+    @override_settings(OBJECT_CACHE={'SHARED': True})
+    def test_question_page_shows_profile_changes(self):
+        _, _, questions, _ = seed(questions=3)
+        Profile.objects.update(avatar='avatars/test.png')
+        path = f'/question/{questions[0].id}/'
+        self.assertEqual(self.client.get(path).context['question'].author.profile.avatar, 'avatars/test.png')
+        Profile.objects.filter(user=questions[0].author).update(avatar='avatars/changed.png')
+        self.assertEqual(self.client.get(path).context['question'].author.profile.avatar, 'avatars/changed.png')
+
+    def test_vote_invalidates_question(self):
+        users, _, questions, _ = seed(questions=3)
+        question = questions[2]
+        self.assertEqual(objectcache.questions.get(question.id).rating, 2)
+        response = self.client.post('/like_question/', {'questionId': question.id, 'type': 'like'}, content_type='application/json')
+        self.assertEqual(response.status_code, 302)  # signed out
+        self.client.force_login(users[-1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/like_question/', {'questionId': question.id, 'type': 'like'}, content_type='application/json')
+        self.assertEqual(objectcache.questions.get(question.id).rating, 3)
+
+    def test_single_flight_computes_once(self):
+        values, computed = {}, []
+
+        def compute():
+            computed.append(1)
+            time.sleep(0.05)
+            values['key'] = 'value'
+            return 'value'
+
+        def lookup():
+            return values.get('key', objectcache.MISSING)
+
+        for shared in [False, True]:
+            values.clear()
+            computed.clear()
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(objectcache.single_flight.run('key', compute, lookup, shared)))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual((results, len(computed)), (['value'] * 8, 1))
+        self.assertEqual(objectcache.single_flight.locks, {})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ComputeOnceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_expired_value_is_served_while_one_caller_recomputes(self):
+        cache.set('computed:key', ('old', 0.01, time.time() - 1), 60)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_compute():
+            started.set()
+            release.wait(5)
+            return 'new'
+
+        with ThreadPoolExecutor(1) as pool:
+            recomputing = pool.submit(objectcache.compute_once, 'key', slow_compute, 60)
+            started.wait(5)
+            self.assertEqual(objectcache.compute_once('key', self.fail, 60), 'old')
+            release.set()
+            self.assertEqual(recomputing.result(), 'new')
+        self.assertEqual(objectcache.compute_once('key', self.fail, 60), 'new')
+
+    def test_early_recomputation(self):
+        # Expires in 1 s; the last computation took 10 s.
+        cache.set('computed:key', ('old', 10, time.time() + 1), 60)
+        with mock.patch('app.objectcache.random.random', return_value=0.0):
+            self.assertEqual(objectcache.compute_once('key', lambda: 'new', 60), 'old')
+        with mock.patch('app.objectcache.random.random', return_value=0.5):
+            self.assertEqual(objectcache.compute_once('key', lambda: 'new', 60), 'new')
+        self.assertEqual(objectcache.compute_once('key', self.fail, 60, beta=0), 'new')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class StampedeTests(LiveServerTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_requests_compute_shared_values_once(self):
+        seed(questions=10)
+        Profile.objects.update(avatar='avatars/test.png')
+        calls = []
+
+        def slow(name, compute):
+            def run(*args):
+                calls.append(name)
+                time.sleep(0.2)
+                return compute(*args)
+            return run
+
+        sidebar = slow('sidebar', views.compute_top_profiles_and_tags)
+        first_page = slow('first page', views.compute_first_page)
+        with mock.patch.object(views, 'compute_top_profiles_and_tags', sidebar), \
+                mock.patch.object(views, 'compute_first_page', first_page), \
+                ThreadPoolExecutor(8) as pool:
+            statuses = list(pool.map(lambda _: urllib.request.urlopen(self.live_server_url + '/').status, range(8)))
+        self.assertEqual(statuses, [200] * 8)
+        self.assertEqual(sorted(calls), ['first page', 'sidebar'])
+
+
+@override_settings(
+    QUERY_COUNT_HEADER=True,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ReplayTests(LiveServerTestCase):
+    ACCESS_LOG = [
+        '127.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET / HTTP/1.1" 200 1234 "-" "curl/8.0"',
+        '127.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET /hot/?page=2 HTTP/1.1" 200 1234 "-" "curl/8.0"',
+        '127.0.0.1 - - [19/Oct/2026:10:00:01 +0000] "POST /like_question/ HTTP/1.1" 200 12 "-" "curl/8.0"',
+        '[2026-10-19 10:00:01 +0000] [42] [INFO] Booting worker with pid: 42',
+        '127.0.0.1 - - [19/Oct/2026:10:00:01 +0000] "GET /nope/ HTTP/1.1" 404 179 "-" "curl/8.0"',
+    ]
+
+    def setUp(self):
+        cache.clear()
+        objectcache.clear_local()
+
+    def test_access_log_conversion(self):
+        records = list(replay.parse_access_log(self.ACCESS_LOG))
+        self.assertEqual([(r['method'], r['path'], r['status']) for r in records], [
+            ('GET', '/', 200), ('GET', '/hot/?page=2', 200), ('POST', '/like_question/', 200), ('GET', '/nope/', 404),
+        ])
+        start = records[0]['timestamp']
+        self.assertEqual([r['timestamp'] - start for r in records], [0, 0.5, 1, 1.5])
+
+    def test_replay_reports_per_route(self):
+        _, _, questions, _ = seed(questions=10)
+        Profile.objects.update(avatar='avatars/test.png')
+        records = [
+            {'timestamp': 0, 'method': 'GET', 'path': '/', 'status': 200},
+            {'timestamp': 0, 'method': 'GET', 'path': f'/question/{questions[0].id}/', 'status': 200},
+            {'timestamp': 0, 'method': 'GET', 'path': f'/question/{questions[1].id}/?page=2', 'status': 200},
+            {'timestamp': 0, 'method': 'POST', 'path': '/like_question/', 'status': 200},
+            {'timestamp': 0, 'method': 'GET', 'path': f'/question/{questions[0].id}/events/', 'status': 200},
+            {'timestamp': 0, 'method': 'GET', 'path': '/nope/', 'status': 404},
+        ]
+        results, skipped = replay.replay(records, self.live_server_url, speed=0, concurrency=2)
+        self.assertEqual(skipped, 2)
+        summary = replay.summarize(results)
+        self.assertEqual(list(summary)[0], '/question/<int:question_id>/')
+        self.assertEqual(set(summary), {'/question/<int:question_id>/', '/', replay.UNMATCHED, 'total'})
+        self.assertEqual(summary['/question/<int:question_id>/']['requests'], 2)
+        self.assertEqual(summary['total']['errors'], 0)
+        self.assertEqual(summary[replay.UNMATCHED]['client_errors'], 1)
+        self.assertGreater(summary['/']['queries'], 0)
+
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="[^"]+"')
+
+
+def render_pages(client, question_id):
+    """HTML of the feed and question pages without the per-request CSRF token."""
+    pages = ['/', '/hot/', '/tag/tag1/', f'/question/{question_id}/']
+    return [CSRF_TOKEN.sub('', client.get(url).content.decode()) for url in pages]
+
+
+class TemplateBundleTests(TestCase):
+    def test_bundle_renders_same_html(self):
+        users, _, questions, _ = seed(questions=10)
+        Profile.objects.update(avatar='avatars/test.png')
+        self.client.force_login(users[1])
+        source = settings.BASE_DIR / 'templates'
+        expected = render_pages(self.client, questions[0].id)
+        with tempfile.TemporaryDirectory() as bundle:
+            _, inlined = template_bundle.build(source, bundle)
+            self.assertGreater(inlined, 0)
+            templates = [{**settings.TEMPLATES[0], 'DIRS': [bundle, source]}, *settings.TEMPLATES[1:]]
+            with override_settings(TEMPLATES=templates):
+                self.assertEqual(render_pages(self.client, questions[0].id), expected)
+
+    def test_stale_bundle_is_detected(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as bundle:
+            shutil.copytree(settings.BASE_DIR / 'templates', source, dirs_exist_ok=True)
+            self.assertFalse(template_bundle.is_fresh(source, bundle))
+            template_bundle.build(source, bundle)
+            self.assertTrue(template_bundle.is_fresh(source, bundle))
+            page = Path(source) / 'ask.html'
+            page.write_text(page.read_text() + '\n')
+            self.assertFalse(template_bundle.is_fresh(source, bundle))
+
+
+@skipUnless(importlib.util.find_spec('jinja2'), 'jinja2 is not installed')
+class Jinja2ParityTests(TestCase):
+    def normalize(self, html):
+        """Jinja2 keeps different blank lines and escapes quotes as &#39;/&#34;."""
+        html = html.replace('&#39;', '&#x27;').replace('&#34;', '&quot;')
+        return re.sub(r'>\s+<', '><', re.sub(r'\s+', ' ', html)).strip()
+
+    def test_jinja2_ports_render_same_html(self):
+        users, _, questions, _ = seed(questions=10)
+        Profile.objects.update(avatar='avatars/test.png')
+        for user in [None, users[0], users[1]]:
+            if user:
+                self.client.force_login(user)
+            expected = render_pages(self.client, questions[0].id)
+            with override_settings(JINJA2_VIEWS=['index', 'hot', 'tag', 'question']):
+                rendered = render_pages(self.client, questions[0].id)
+            for django_html, jinja2_html in zip(expected, rendered):
+                django_html, jinja2_html = self.normalize(django_html), self.normalize(jinja2_html)
+                if django_html != jinja2_html:
+                    diff = difflib.unified_diff(
+                        django_html.replace('><', '>\n<').splitlines(),
+                        jinja2_html.replace('><', '>\n<').splitlines(),
+                        'django', 'jinja2', lineterm='',
+                    )
+                    self.fail('\n'.join(diff))
+
+
+class StartupImportTests(TestCase):
+    LAZY_MODULES = ['django.contrib.admin', 'django.contrib.postgres.search', 'faker', 'PIL', 'numpy']
+
+    def test_worker_startup_skips_rarely_used_modules(self):
+        script = (
+            'import sys, django; django.setup()\n'
+            'from django.urls import get_resolver; get_resolver().url_patterns\n'
+            f'print(sorted(m for m in {self.LAZY_MODULES!r} if m in sys.modules))'
+        )
+        env = dict(os.environ, ASKME_ADMIN='0')
+        result = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
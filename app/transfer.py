@@ -0,0 +1,264 @@
+"""Streaming export and import of the Q&A content as gzip-compressed NDJSON.
+
+A dump is a directory with a manifest.json and, per table, numbered files
+of at most ``rows_per_file`` rows in primary key order:
+
+    manifest.json
+    app_question.0000.ndjson.gz
+    app_question.0001.ndjson.gz
+    ...
+
+Rows are read through server-side cursors and written a line at a time,
+so memory stays flat whatever the table size. Tables are exported in
+parallel from one shared snapshot (pg_export_snapshot), so the dump is
+consistent. A file is only recorded in the manifest once it is complete:
+an interrupted export resumes after the last recorded file of each table,
+from a new snapshot. Imports record loaded files in import-state.json the
+same way.
+
+Derived data is not exported: related questions are rebuilt by their job,
+the denormalized counters and user stats are recounted after the import
+(app.counters), and the duplicate index is built by ``index_duplicates``.
+"""
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+
+from app import counters
+from app.models import Profile, Tag, Question, Answer, QuestionLike, AnswerLike, ReputationBucket
+
+FORMAT = 1
+CHUNK_SIZE = 2000
+ROWS_PER_FILE = 100_000
+
+# Tables of one level only reference tables of earlier levels, so each
+# level can be imported in parallel once the previous one is loaded. The
+# counter triggers of tables in one level must update different tables,
+# or their long per-file transactions deadlock on the counter rows.
+LEVELS = [
+    [User, Tag],
+    [Profile, Question, ReputationBucket],
+    [Question.tags.through, Answer],
+    [QuestionLike, AnswerLike],
+]
+MODELS = [model for level in LEVELS for model in level]
+
+# Columns referencing a later level, loaded after everything else.
+DEFERRED = {
+    Question: ['accepted_answer_id'],
+}
+
+
+def table_name(model):
+    return model._meta.db_table
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+class State:
+    """A JSON file of per-table progress, rewritten atomically on every change.
+
+    ``tables[name]`` is {'files': [{'name', 'rows', 'last_pk'}], 'complete': bool}.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        if self.path.exists():
+            self.data = json.loads(self.path.read_text())
+        else:
+            self.data = {'format': FORMAT, 'tables': {}}
+
+    def table(self, name):
+        with self.lock:
+            return self.data['tables'].setdefault(name, {'files': [], 'complete': False})
+
+    def add_file(self, name, file_name, rows, last_pk):
+        with self.lock:
+            self.data['tables'][name]['files'].append({'name': file_name, 'rows': rows, 'last_pk': last_pk})
+            self.save()
+
+    def complete(self, name):
+        with self.lock:
+            self.data['tables'][name]['complete'] = True
+            self.save()
+
+    def save(self):
+        temporary = self.path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.data, indent=2))
+        os.replace(temporary, self.path)
+
+
+def in_thread(func):
+    """Run ``func`` in a worker thread with its own connection, closed afterwards."""
+    def run(*args):
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+    return run
+
+
+def dump_table(model, directory, manifest, snapshot, chunk_size, rows_per_file):
+    """Write the remaining rows of ``model``; returns how many."""
+    name = table_name(model)
+    state = manifest.table(name)
+    if state['complete']:
+        return 0
+    fields = columns(model)
+    pk = model._meta.pk.attname
+    queryset = model._base_manager.order_by(pk).values_list(*fields)
+    if state['files']:
+        queryset = queryset.filter(pk__gt=state['files'][-1]['last_pk'])
+
+    exported = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        cursor.execute('SET TRANSACTION SNAPSHOT %s', [snapshot])
+        rows = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            file_name = f"{name}.{len(state['files']):04d}.ndjson.gz"
+            part = directory / f'{file_name}.part'
+            count = last_pk = 0
+            with gzip.open(part, 'wt', encoding='utf-8') as output:
+                for row in rows:
+                    record = dict(zip(fields, row))
+                    output.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+                    last_pk = record[pk]
+                    count += 1
+                    if count == rows_per_file:
+                        break
+            if not count:
+                part.unlink()
+                break
+            os.replace(part, directory / file_name)
+            manifest.add_file(name, file_name, count, last_pk)
+            exported += count
+            if count < rows_per_file:
+                break
+    manifest.complete(name)
+    return exported
+
+
+def dump(directory, workers=4, chunk_size=CHUNK_SIZE, rows_per_file=ROWS_PER_FILE, progress=None):
+    """Export every table into ``directory``, resuming a previous run there; returns {table: rows}."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = State(directory / 'manifest.json')
+    run = in_thread(dump_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Workers read from this transaction's snapshot, which lives until it ends.
+        cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        cursor.execute('SELECT pg_export_snapshot()')
+        snapshot = cursor.fetchone()[0]
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {
+                table_name(model): pool.submit(run, model, directory, manifest, snapshot, chunk_size, rows_per_file)
+                for model in MODELS
+            }
+            results = {}
+            for name, future in futures.items():
+                results[name] = future.result()
+                if progress:
+                    progress(name, results[name])
+    return results
+
+
+def read_rows(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            yield json.loads(line)
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_table(model, directory, manifest, imported, chunk_size):
+    """Load the files of ``model`` not loaded yet; returns their rows."""
+    name = table_name(model)
+    deferred = DEFERRED.get(model, [])
+    done = {file['name'] for file in imported.table(name)['files']}
+    loaded = 0
+    for file in manifest.table(name)['files']:
+        if file['name'] in done:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL askme.skip_events = 'on'")
+            for batch in batches(read_rows(directory / file['name']), chunk_size):
+                objects = [model(**{**row, **dict.fromkeys(deferred)}) for row in batch]
+                # Rows of a file loaded before an interruption are skipped.
+                model._base_manager.bulk_create(objects, ignore_conflicts=True)
+                loaded += len(objects)
+        imported.add_file(name, file['name'], file['rows'], file['last_pk'])
+    imported.complete(name)
+    return loaded
+
+
+def load_deferred(model, directory, manifest, chunk_size):
+    """Fill the columns of ``model`` left empty because they reference later tables."""
+    table = table_name(model)
+    pk = model._meta.pk.attname
+    for file in manifest.table(table)['files']:
+        for field in DEFERRED[model]:
+            with transaction.atomic(), connection.cursor() as cursor:
+                for batch in batches(read_rows(directory / file['name']), chunk_size):
+                    pairs = [(row[pk], row[field]) for row in batch if row[field] is not None]
+                    if pairs:
+                        cursor.execute(
+                            f'UPDATE {table} t SET {field} = v.value '
+                            f'FROM unnest(%s::bigint[], %s::bigint[]) AS v(key, value) WHERE t.{pk} = v.key',
+                            [[key for key, _ in pairs], [value for _, value in pairs]],
+                        )
+
+
+def is_empty():
+    return not any(model._base_manager.exists() for model in MODELS)
+
+
+def load(directory, workers=4, chunk_size=CHUNK_SIZE, progress=None):
+    """Load a dump made by dump(); returns {table: rows loaded}.
+
+    Progress is kept in ``directory``/import-state.json, so running it
+    again after an interruption continues where it stopped.
+    """
+    directory = Path(directory)
+    manifest = State(directory / 'manifest.json')
+    imported = State(directory / 'import-state.json')
+    run = in_thread(load_table)
+    results = {}
+    with ThreadPoolExecutor(workers) as pool:
+        for level in LEVELS:
+            futures = {
+                table_name(model): pool.submit(run, model, directory, manifest, imported, chunk_size)
+                for model in level
+            }
+            for name, future in futures.items():
+                results[name] = future.result()
+                if progress:
+                    progress(name, results[name])
+
+    for model in DEFERRED:
+        load_deferred(model, directory, manifest, chunk_size)
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), MODELS):
+            cursor.execute(sql)
+    counters.recount()
+    return results
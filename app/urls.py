@@ -1,19 +1,28 @@
 from django.urls import path
 
-from app import views
+from app import api, views
 
 urlpatterns = [path('', views.index, name='index'),
                path('', views.index, name='ask'),
                path('hot/', views.hot, name='hot'),
                path('question/<int:question_id>/', views.question, name='question'),
+               path('question/<int:question_id>/events/', views.question_events, name='question.events'),
+               path('answer/<int:answer_id>/', views.answer, name='answer'),
                path('ask/', views.ask, name='ask'),
                path('tag/<str:tag_name>/', views.tag, name='tag'),
+               path('search/', views.search, name='search'),
                path('login/', views.login, name='login'),
                path('logout/', views.logout, name='logout'),
                path('signup/', views.signup, name='signup'),
                path('profile/edit/', views.profile_edit, name='profile.edit'),
                path('profile/<int:profile_id>/', views.profile, name='profile'),
+               path('users/top/', views.top_users, name='users.top'),
                path('like_question/', views.like_question, name='like_question'),
                path('like_answer/', views.like_answer, name='like_answer'),
+               path('like_batch/', views.like_batch, name='like_batch'),
                path('approve_answer/', views.approve_answer, name='approve_answer'),
+               path('api/v1/questions/', api.questions, name='api.questions'),
+               path('api/v1/questions/similar/', api.similar_questions, name='api.questions.similar'),
+               path('api/v1/questions/<int:question_id>/answers/', api.answers, name='api.answers'),
+               path('api/v1/tags/suggest/', api.suggest_tags, name='api.tags.suggest'),
                ]
@@ -1,22 +1,38 @@
 from django.core.paginator import Paginator
 from django.core.paginator import PageNotAnInteger, EmptyPage
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, Http404
+from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, redirect
 from django.contrib import auth
+from django.contrib.auth.models import User
 
-from .models import Question, Answer, Profile, Tag, QuestionLike, AnswerLike
-from .forms import LoginForm, SignupForm, AskForm, AnswerForm, ProfileEditForm, QuestionLikeForm, AnswerLikeForm, AnswerApproveForm
-from django.shortcuts import get_object_or_404
+from . import cursors, events, objectcache
+from .ratelimit import rate_limit
+from .models import Question, Answer, Profile, Tag, QuestionLike, AnswerLike, UserStats, ReputationBucket
+from .forms import LoginForm, SignupForm, AskForm, AnswerForm, ProfileEditForm, QuestionLikeForm, AnswerLikeForm, AnswerApproveForm, VoteBatchForm
 from django.conf import settings
 import json
 from django import forms
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 
+ANSWERS_PER_PAGE = 5
+PROFILE_POSTS_PER_PAGE = 10
+LEADERBOARD_SIZE = 50
+RELATED_QUESTIONS = 5
+QUESTIONS_PER_PAGE = 5
+# Seconds the sidebar and the first feed pages are reused for (then served stale while recomputed).
+SIDEBAR_TTL = 60
+FIRST_PAGE_TTL = 10
+
+
+def compute_top_profiles_and_tags():
+    return list(Profile.objects.get_top_profiles_by_reputation()), list(Tag.objects.top_tags_by_questions_count())
+
+
 def get_top_profiles_and_tags():
-    top_profiles = Profile.objects.get_top_profiles_by_rating()
-    top_tags = Tag.objects.top_tags_by_questions_count()
-    return top_profiles, top_tags
+    return objectcache.compute_once('sidebar', compute_top_profiles_and_tags, SIDEBAR_TTL)
 
 
 def paginate(objects_list, request, per_page=10):
@@ -32,57 +48,58 @@ def paginate(objects_list, request, per_page=10):
         else:
             paginator.get_page(1)
 
-    page_data = {
+    return page_obj.object_list, paginate_data(page_obj)
+
+
+def paginate_data(page_obj):
+    return {
         'page': page_obj.number,
         'next_page_number': page_obj.next_page_number() if page_obj.has_next() else None,
         'previous_page_number': page_obj.previous_page_number() if page_obj.has_previous() else None,
-        'pages': paginator.num_pages,
+        'pages': page_obj.paginator.num_pages,
         'has_previous': page_obj.has_previous(),
         'has_next': page_obj.has_next(),
     }
 
-    return page_obj.object_list, page_data
-
-def get_paginated_questions(request, questions):
-    questions, page_data = paginate(questions, request, 5)
-    
-    if request.user.is_authenticated:
-        user_id = request.user.id
-        for question in questions:
-            question.has_voted = any(like.id == user_id for like in question.likes.all())
-    else:
-        for question in questions:
-            question.has_voted = False
-    
-    top_profiles, top_tags = get_top_profiles_and_tags()
-    return {
-        'questions': questions,
-        'page_data': page_data,
-        'top_profiles': top_profiles,
-        'top_tags': top_tags,
-        'user': request.user,
-    }
-
-def get_paginated_answers(request, answers):
-    answers, page_data = paginate(answers, request, 5)
-    if request.user.is_authenticated:
-        user_id = request.user.id
-        for answer in answers:
-            answer.has_voted = answer.has_liked(user_id)
-    else:
-        for answer in answers:
-            answer.has_voted = False
-    return answers, page_data
-
-def get_paginated_questions(request, questions):
-    questions, page_data = paginate(questions, request, 5)
-    if request.user.is_authenticated:
-        user_id = request.user.id
-        for question in questions:
-            question.has_voted = question.has_liked(user_id)
+def template_engine(view_name):
+    """Template backend for the view: the Jinja2 port when listed in settings.JINJA2_VIEWS."""
+    return 'jinja2' if view_name in settings.JINJA2_VIEWS else 'django'
+
+def mark_voted(request, objects, votes, key):
+    """Set ``has_voted`` on ``objects`` with one query for the current user's votes on them."""
+    voted = set()
+    if request.user.is_authenticated and objects:
+        voted = set(votes.filter(
+            author_id=request.user.id, **{f'{key}__in': [obj.id for obj in objects]}
+        ).values_list(key, flat=True))
+    for obj in objects:
+        obj.has_voted = obj.id in voted
+
+def attach_authors(posts):
+    """Set ``author`` (with its profile) of ``posts`` with one query.
+
+    Cached questions are stored without their authors, so that profile
+    changes show on question pages at once.
+    """
+    authors = User.objects.select_related('profile').in_bulk({post.author_id for post in posts})
+    for post in posts:
+        post.author = authors[post.author_id]
+
+def compute_first_page(questions):
+    page = Paginator(questions, QUESTIONS_PER_PAGE).page(1)
+    return list(page.object_list), paginate_data(page)
+
+
+def get_paginated_questions(request, questions, feed=None):
+    """Context of a page of ``questions``; the first pages of named feeds are shared by all users."""
+    questions = questions.select_related('author__profile')
+    if feed and request.GET.get('page', '1') == '1':
+        questions, page_data = objectcache.compute_once(
+            f'feed:{feed}', lambda: compute_first_page(questions), FIRST_PAGE_TTL
+        )
     else:
-        for question in questions:
-            question.has_voted = False
+        questions, page_data = paginate(questions, request, QUESTIONS_PER_PAGE)
+    mark_voted(request, questions, QuestionLike.objects, 'question_id')
     top_profiles, top_tags = get_top_profiles_and_tags()
     return {
         'questions': questions,
@@ -94,38 +111,67 @@ def get_paginated_questions(request, questions):
 
 def index(request):
     all_questions = Question.objects.new()
-    context = get_paginated_questions(request, all_questions)
-    return render(request, 'index.html', context=context)
+    context = get_paginated_questions(request, all_questions, feed='new')
+    return render(request, 'index.html', context=context, using=template_engine('index'))
 
 
 def hot(request):
     all_questions = Question.objects.hot()
+    context = get_paginated_questions(request, all_questions, feed='hot')
+    return render(request, 'hot.html', context=context, using=template_engine('hot'))
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    all_questions = Question.searchable.search(query) if query else Question.objects.none()
     context = get_paginated_questions(request, all_questions)
-    return render(request, 'hot.html', context=context)
+    context['query'] = query
+    return render(request, 'search.html', context=context)
+
+
+def answer_url(answer_id):
+    location = Answer.objects.location(answer_id)
+    if not location:
+        return None
+    question_id, position = location
+    page = position // ANSWERS_PER_PAGE + 1
+    return f"{reverse('question', args=[question_id])}?page={page}#answer_{answer_id}"
 
 
 def handle_answer_form(request, question_id, form):
     if request.method == 'POST' and form.is_valid() and request.user:
         answer_id = form.save()
-        answers, page_data = paginate(Answer.objects.by_question(question_id), request, 5)
-        last_page = page_data['pages']
-        return redirect(f'/question/{question_id}/?page={last_page}#answer_{answer_id}')
+        return redirect(answer_url(answer_id))
 
     return None
 
 
+@rate_limit('answer', '10/m')
 def question(request, question_id):
     form = AnswerForm(request.POST or None, user=request.user, question=question_id)
     redirect_response = handle_answer_form(request, question_id, form)
     if redirect_response:
         return redirect_response
 
+    context = get_question_context(request, question_id, form)
+    return render(request, 'question.html', context=context, using=template_engine('question'))
+
+
+def get_question_context(request, question_id, form):
     top_profiles, top_tags = get_top_profiles_and_tags()
-    question = get_object_or_404(Question.objects.by_id(question_id))
-    all_answers = Answer.objects.by_question(question_id)
-    answers, page_data = get_paginated_answers(request, all_answers)
-    context = {
+    question = objectcache.questions.get(question_id)
+    if question is None:
+        raise Http404('Question not found')
+    all_answers = Answer.objects.by_question(question_id).select_related('author__profile')
+    answers, page_data = paginate(all_answers, request, ANSWERS_PER_PAGE)
+    accepted_answer = question.accepted_answer if page_data['page'] == 1 else None
+    attach_authors([question, accepted_answer] if accepted_answer else [question])
+    mark_voted(request, [*answers, accepted_answer] if accepted_answer else answers, AnswerLike.objects, 'answer_id')
+    related_questions = Question.objects.related(question_id).prefetch_related(None)[:RELATED_QUESTIONS]
+    return {
         'question': question,
+        'accepted_answer': accepted_answer,
+        'related_questions': related_questions,
         'answers': answers,
         'page_data': page_data,
         'top_profiles': top_profiles,
@@ -134,7 +180,13 @@ def question(request, question_id):
         'form': form,
         'MEDIA_URL': settings.MEDIA_URL,
     }
-    return render(request, 'question.html', context=context)
+
+
+def answer(request, answer_id):
+    url = answer_url(answer_id)
+    if not url:
+        raise Http404('Answer not found')
+    return redirect(url)
 
 
 def handle_ask_form(request, form):
@@ -145,6 +197,7 @@ def handle_ask_form(request, form):
 
 
 @login_required(login_url=settings.LOGIN_URL)
+@rate_limit('ask', '5/m')
 def ask(request):
     top_profiles, top_tags = get_top_profiles_and_tags()
     form = AskForm(request.POST or None, user=request.user)
@@ -163,10 +216,10 @@ def ask(request):
 
 def tag(request, tag_name):
     top_profiles, top_tags = get_top_profiles_and_tags()
-    all_questions = Question.objects.by_tag(tag_name)
-    if not all_questions:
+    all_questions = Question.objects.by_tag(tag_name).select_related('author__profile')
+    if not objectcache.tags.get(tag_name):
         return page_not_found(request, "Tag not found")
-    questions, page_data = paginate(all_questions, request, 5)
+    questions, page_data = paginate(all_questions, request, QUESTIONS_PER_PAGE)
     context = {
         'questions': questions,
         'tag': tag_name,
@@ -175,7 +228,7 @@ def tag(request, tag_name):
         'top_tags': top_tags,
         'user': request.user
     }
-    return render(request, 'tag.html', context=context)
+    return render(request, 'tag.html', context=context, using=template_engine('tag'))
 
 
 def handle_login_form(request, form):
@@ -253,6 +306,7 @@ def handle_profile_edit_form(request, form):
     return None
 
 
+@login_required(login_url=settings.LOGIN_URL)
 def profile_edit(request):
     top_profiles, top_tags = get_top_profiles_and_tags()
     form = ProfileEditForm(request.POST or None, request.FILES or None, user=request.user)
@@ -277,14 +331,48 @@ def page_not_found(request, exception):
         'top_tags': top_tags,
         'user': request.user
     }
-    return render(request, '404.html', context=context)
+    return render(request, '404.html', context=context, status=404)
+
+
+def query_with(request, **params):
+    """The current query string with ``params`` replaced, for links that page one list of several."""
+    query = request.GET.copy()
+    for key, value in params.items():
+        query[key] = value
+    return query.urlencode()
 
 
 def profile(request, profile_id):
     top_profiles, top_tags = get_top_profiles_and_tags()
-    profile_model = get_object_or_404(Profile.objects.by_id(profile_id))
+    profile_model = objectcache.profiles.get(profile_id)
+    if profile_model is None:
+        raise Http404('Profile not found')
+    user_id = profile_model.user_id
+    stats = UserStats.objects.filter(user_id=user_id).first() or UserStats(user_id=user_id)
+    try:
+        questions, next_questions = cursors.page(
+            Question.objects.by_author(user_id).prefetch_related(None),
+            ['-created_at', '-id'],
+            request.GET.get('questions'),
+            PROFILE_POSTS_PER_PAGE,
+            fields=['id', 'title', 'rating', 'answers_count', 'created_at'],
+        )
+        answers, next_answers = cursors.page(
+            Answer.objects.by_author(user_id),
+            ['-created_at', '-id'],
+            request.GET.get('answers'),
+            PROFILE_POSTS_PER_PAGE,
+            fields=['id', 'content', 'rating', 'is_correct', 'created_at'],
+        )
+    except cursors.InvalidCursor:
+        raise Http404('Invalid page')
     context = {
         'profile': profile_model,
+        'stats': stats,
+        'questions': questions,
+        'older_questions': next_questions and query_with(request, questions=next_questions),
+        'answers': answers,
+        'older_answers': next_answers and query_with(request, answers=next_answers),
         'top_profiles': top_profiles,
         'top_tags': top_tags,
         'user': request.user,
@@ -292,8 +380,40 @@ def profile(request, profile_id):
     }
     return render(request, 'profile.html', context=context)
 
+async def question_events(request, question_id):
+    if not isinstance(request, ASGIRequest):
+        # A sync worker would be held for the whole stream; 204 tells
+        # EventSource not to reconnect.
+        return HttpResponse(status=204)
+    if not await Question.objects.filter(id=question_id).aexists():
+        raise Http404('Question not found')
+    response = StreamingHttpResponse(events.stream(question_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def top_users(request):
+    top_profiles, top_tags = get_top_profiles_and_tags()
+    window = request.GET.get('window', 'all')
+    if window == 'week':
+        leaders = [
+            (bucket.user, bucket.points) for bucket in ReputationBucket.objects.top(LEADERBOARD_SIZE)
+        ]
+    else:
+        window = 'all'
+        leaders = [(stats.user, stats.reputation) for stats in UserStats.objects.top(LEADERBOARD_SIZE)]
+    context = {
+        'leaders': leaders,
+        'window': window,
+        'top_profiles': top_profiles,
+        'top_tags': top_tags,
+        'user': request.user,
+    }
+    return render(request, 'top_users.html', context=context)
+
 @require_POST
 @login_required(login_url=settings.LOGIN_URL)
+@rate_limit('vote', '60/m')
 def like_question(request):
     try:
         data = json.loads(request.body)
@@ -307,6 +427,7 @@ def like_question(request):
 
 @require_POST
 @login_required(login_url=settings.LOGIN_URL)
+@rate_limit('vote', '60/m')
 def like_answer(request):
     try:
         data = json.loads(request.body)
@@ -318,8 +439,31 @@ def like_answer(request):
     except forms.ValidationError as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=404)
 
+def vote_batch_size(request):
+    """Votes in a batch request, so that the vote limit counts votes rather than requests."""
+    try:
+        votes = json.loads(request.body)
+    except ValueError:
+        return 1
+    return max(len(votes), 1) if isinstance(votes, list) else 1
+
+@require_POST
+@login_required(login_url=settings.LOGIN_URL)
+@rate_limit('vote', '60/m', cost=vote_batch_size)
+def like_batch(request):
+    try:
+        data = json.loads(request.body)
+        form = VoteBatchForm(data={'votes': data}, user=request.user)
+        if form.is_valid():
+            ratings = form.save()
+            return JsonResponse({'status': 'success', 'ratings': ratings})
+        return JsonResponse({'status': 'error', 'message': form.errors}, status=400)
+    except forms.ValidationError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=404)
+
 @require_POST
 @login_required(login_url=settings.LOGIN_URL)
+@rate_limit('vote', '60/m')
 def approve_answer(request):
     try:
         data = json.loads(request.body)
@@ -1,6 +1,62 @@
+"""Gunicorn settings with selectable worker profiles.
+
+    GUNICORN_PROFILE=gthread gunicorn -c askme_garoev/gunicorn.conf.py
+
+Profiles (default: sync):
+  sync     one request per process; 2 x CPU + 1 workers.
+  gthread  CPU + 1 workers with GUNICORN_THREADS (default 4) threads each;
+           waits on the database overlap within a process.
+  uvicorn  one asyncio worker per CPU serving the ASGI app; needed for the
+           server-sent event streams, which would pin a sync worker each.
+
+GUNICORN_WORKERS overrides the computed worker count.
+"""
 import multiprocessing
+import os
+
+cpus = multiprocessing.cpu_count()
+
+PROFILES = {
+    'sync': {
+        'worker_class': 'sync',
+        'workers': 2 * cpus + 1,
+        'threads': 1,
+        'wsgi_app': 'askme_garoev.wsgi:application',
+    },
+    'gthread': {
+        'worker_class': 'gthread',
+        'workers': cpus + 1,
+        'threads': int(os.environ.get('GUNICORN_THREADS', 4)),
+        'wsgi_app': 'askme_garoev.wsgi:application',
+    },
+    'uvicorn': {
+        'worker_class': 'uvicorn.workers.UvicornWorker',
+        'workers': cpus,
+        'threads': 1,
+        'wsgi_app': 'askme_garoev.asgi:application',
+    },
+}
+
+profile = os.environ.get('GUNICORN_PROFILE', 'sync')
+if profile not in PROFILES:
+    raise RuntimeError(f"Unknown GUNICORN_PROFILE {profile!r}, expected one of {', '.join(PROFILES)}")
+
+worker_class = PROFILES[profile]['worker_class']
+workers = int(os.environ.get('GUNICORN_WORKERS', PROFILES[profile]['workers']))
+threads = PROFILES[profile]['threads']
+wsgi_app = PROFILES[profile]['wsgi_app']
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+
+# Import Django and the app once in the master; workers share those pages copy-on-write.
+preload_app = True
+
+# Recycle workers to bound memory growth; jitter keeps them from restarting together.
+max_requests = 1000
+max_requests_jitter = 100
 
-bind = '127.0.0.1:8000'
-workers = 2 + 1
+# Streams send a heartbeat every 15 s (app.events.HEARTBEAT).
+timeout = 30
+graceful_timeout = 30
 
-accesslog = '/var/tmp/askme_garoev.gunicorn.log'
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '/var/tmp/askme_garoev.gunicorn.log')
@@ -0,0 +1,29 @@
+"""Jinja2 environment for the ported feed and question templates in jinja2/.
+
+Mirrors the Django template tags those templates use: ``static``, ``url``
+and django-bootstrap-v5's ``bootstrap_form`` / ``buttons``.
+"""
+from bootstrap5.forms import render_field_and_label, render_form, render_form_group
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+
+
+def url(name, *args):
+    return reverse(name, args=args)
+
+
+def bootstrap_buttons(caller):
+    """{% call bootstrap_buttons() %}<button>...</button>{% endcall %}, like {% buttons %}."""
+    return render_form_group(render_field_and_label(field=caller(), label=None))
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'bootstrap_form': render_form,
+        'bootstrap_buttons': bootstrap_buttons,
+    })
+    return env
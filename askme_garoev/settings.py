@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
+from app import template_bundle
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -30,9 +34,13 @@ ALLOWED_HOSTS = ["*"]
 
 # Application definition
 
+# Web workers for public traffic can run without the admin (ASKME_ADMIN=0):
+# importing it and autodiscovering admin.py is a noticeable part of startup.
+ADMIN_ENABLED = os.environ.get('ASKME_ADMIN', '1') != '0'
+
 INSTALLED_APPS = [
     'app.apps.AppConfig',
-    'django.contrib.admin',
+    *(['django.contrib.admin'] if ADMIN_ENABLED else []),
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -41,7 +49,11 @@ INSTALLED_APPS = [
     'bootstrap5',
 ]
 
+# Adds an X-DB-Queries response header for `manage.py replay` (app/middleware.py).
+QUERY_COUNT_HEADER = os.environ.get('ASKME_QUERY_COUNT') == '1'
+
 MIDDLEWARE = [
+    'app.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,14 +65,31 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'askme_garoev.urls'
 
+# Templates with static includes inlined, built at deploy time by
+# `manage.py bundle_templates` (see app/template_bundle.py). Used with
+# ASKME_TEMPLATE_BUNDLE=1, and only while built from the current templates.
+TEMPLATE_BUNDLE_DIR = BASE_DIR / 'build' / 'templates'
+TEMPLATE_BUNDLE = (
+    os.environ.get('ASKME_TEMPLATE_BUNDLE') == '1'
+    and template_bundle.is_fresh(BASE_DIR / 'templates', TEMPLATE_BUNDLE_DIR)
+)
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [
+            *([TEMPLATE_BUNDLE_DIR] if TEMPLATE_BUNDLE else []),
             BASE_DIR / 'templates',
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Django's default loaders, spelled out: parsed templates are
+            # kept per process and the source is read once.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -71,6 +100,21 @@ TEMPLATES = [
     },
 ]
 
+# Optional Jinja2 ports of the feed and question pages (jinja2/), used by the
+# views listed in JINJA2_VIEWS, e.g. ASKME_JINJA2_VIEWS=index,hot,tag,question.
+if importlib.util.find_spec('jinja2'):
+    TEMPLATES.append({
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [
+            BASE_DIR / 'jinja2',
+        ],
+        'OPTIONS': {
+            'environment': 'askme_garoev.jinja2.environment',
+        },
+    })
+
+JINJA2_VIEWS = [view for view in os.environ.get('ASKME_JINJA2_VIEWS', '').split(',') if view]
+
 WSGI_APPLICATION = 'askme_garoev.wsgi.application'
 
 
@@ -87,6 +131,34 @@ DATABASES = {
     }
 }
 
+# Cache shared by the workers (compute_once values, cache statistics): an unlogged
+# PostgreSQL table (migration 0013) unless ASKME_REDIS_URL points to a Redis server.
+if os.environ.get('ASKME_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['ASKME_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'askme_cache',
+            'OPTIONS': {'MAX_ENTRIES': 100_000},
+        }
+    }
+
+# The object cache (app/objectcache.py) keeps instances in the shared cache only
+# with Redis: a lookup in the cache table costs as many queries as loading them.
+OBJECT_CACHE = {'SHARED': bool(os.environ.get('ASKME_REDIS_URL'))}
+
+# Reverse proxies whose X-Forwarded-For names the client for rate limits (app/ratelimit.py),
+# e.g. ASKME_TRUSTED_PROXIES=127.0.0.1 behind nginx on the same host.
+RATE_LIMIT_TRUSTED_PROXIES = [
+    proxy.strip() for proxy in os.environ.get('ASKME_TRUSTED_PROXIES', '').split(',') if proxy.strip()
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
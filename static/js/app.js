@@ -92,7 +92,14 @@ for (const answer of answers) {
                 .then((response) => response.json())
                 .then((data) => {
                     if (data.status === 'success') {
-                        correctCheckbox.checked = data.is_correct
+                        // Only one answer can be accepted; the pinned copy shares the id.
+                        for (const checkbox of document.querySelectorAll('.correct-checkbox')) {
+                            if (checkbox.closest('.answer').dataset.answerId === answer.dataset.answerId) {
+                                checkbox.checked = data.is_correct
+                            } else if (data.is_correct) {
+                                checkbox.checked = false
+                            }
+                        }
                     } else {
                         console.log(data)
                     }
@@ -102,4 +109,128 @@ for (const answer of answers) {
                 })
         })
     }
-}
\ No newline at end of file
+}
+
+const eventsContainer = document.querySelector('[data-events-url]')
+
+function subscribeToQuestionEvents(container) {
+    const source = new EventSource(container.dataset.eventsUrl)
+    const newAnswers = container.querySelector('.new-answers')
+    let newAnswersCount = 0
+
+    source.addEventListener('rating', (event) => {
+        const data = JSON.parse(event.data)
+        const selector = data.target === 'question'
+            ? `.question[data-question-id="${data.id}"] .rating`
+            : `.answer[data-answer-id="${data.id}"] .rating`
+        for (const rating of container.querySelectorAll(selector)) {
+            rating.textContent = data.rating
+        }
+    })
+
+    source.addEventListener('answer', (event) => {
+        const data = JSON.parse(event.data)
+        if (container.querySelector(`.answer[data-answer-id="${data.id}"]`)) return
+        newAnswersCount += 1
+        newAnswers.querySelector('.new-answers-count').textContent = newAnswersCount
+        newAnswers.querySelector('.new-answers-link').href = `/answer/${data.id}/`
+        newAnswers.classList.remove('d-none')
+    })
+
+    source.addEventListener('correct', (event) => {
+        const data = JSON.parse(event.data)
+        for (const checkbox of container.querySelectorAll(`.answer[data-answer-id="${data.id}"] .correct-checkbox`)) {
+            checkbox.checked = data.is_correct
+        }
+    })
+}
+
+if (eventsContainer && window.EventSource) {
+    subscribeToQuestionEvents(eventsContainer)
+}
+
+const SUGGEST_DELAY = 250
+
+function debounce(func, delay) {
+    let timer = null
+    return (...args) => {
+        clearTimeout(timer)
+        timer = setTimeout(() => func(...args), delay)
+    }
+}
+
+function suggestTags(input) {
+    const datalist = document.getElementById(input.getAttribute('list'))
+    let controller = null
+
+    // Only the word being typed is completed; options carry the words before it.
+    return () => {
+        const words = input.value.split(' ')
+        const prefix = words.pop()
+        if (controller) controller.abort()
+        if (!prefix) {
+            datalist.replaceChildren()
+            return
+        }
+        controller = new AbortController()
+        fetch(`${input.dataset.suggestUrl}?prefix=${encodeURIComponent(prefix)}`, {signal: controller.signal})
+            .then((response) => response.json())
+            .then((data) => {
+                datalist.replaceChildren(...data.results.map((tag) => {
+                    const option = document.createElement('option')
+                    option.value = [...words, tag.name].join(' ')
+                    option.label = `${tag.questions_count} questions`
+                    return option
+                }))
+            })
+            .catch((error) => {
+                if (error.name !== 'AbortError') console.error(error)
+            })
+    }
+}
+
+const tagsInput = document.querySelector('input[data-suggest-url]')
+if (tagsInput) {
+    tagsInput.addEventListener('input', debounce(suggestTags(tagsInput), SUGGEST_DELAY))
+}
+
+function showSimilarQuestions(input) {
+    const container = document.querySelector('.similar-questions')
+    const list = container.querySelector('.similar-questions-list')
+    let controller = null
+
+    // Titles only: the text can be too long for a URL, it is checked on submit.
+    return () => {
+        const title = input.value.trim()
+        if (controller) controller.abort()
+        if (!title) {
+            container.classList.add('d-none')
+            return
+        }
+        controller = new AbortController()
+        fetch(`${input.dataset.similarUrl}?title=${encodeURIComponent(title)}`, {signal: controller.signal})
+            .then((response) => response.json())
+            .then((data) => {
+                list.replaceChildren(...data.results.map((question) => {
+                    const item = document.createElement('li')
+                    const link = document.createElement('a')
+                    link.href = `/question/${question.id}/`
+                    link.textContent = question.title
+                    const answers = document.createElement('span')
+                    answers.className = 'text-muted'
+                    answers.textContent = ` (${question.answers_count} answers)`
+                    item.append(link, answers)
+                    return item
+                }))
+                container.classList.toggle('d-none', !data.results.length)
+            })
+            .catch((error) => {
+                if (error.name !== 'AbortError') console.error(error)
+            })
+    }
+}
+
+const titleInput = document.querySelector('input[data-similar-url]')
+if (titleInput) {
+    titleInput.addEventListener('input', debounce(showSimilarQuestions(titleInput), SUGGEST_DELAY))
+}